@@ -29,11 +29,12 @@ import argparse
 import sys
 import textwrap
 from decimal import Decimal
-from typing import List
+from typing import List, Optional
 from os import getenv as env
 from privex.helpers import ErrHelpParser, empty, empty_if, is_true
 from colorama import Fore
-from colfixer import settings, core
+from colfixer import settings, core, fleet, journal, prescan, state, watch
+from colfixer.plan import TableStatus
 import logging
 
 GREEN = Fore.GREEN
@@ -50,9 +51,24 @@ CMD_DESC = {
     'list_tables': "List all tables in a given database, showing their collation and other info",
     'list_columns': "List all columns in a given table or database, showing their collation and other info",
     'convert_table': "Convert a given table to a different character set / collation",
+    'fleet': "Plan a conversion once against a reference server, then run it on every server in an inventory file in parallel",
+    'revert': "Undo a previous run (or part of one) using the original definitions saved in its journal",
+    'prescan': "Scan the data in each column to find pure ASCII, oversized or lossy columns before converting them",
+    'converge': "Converge schemas, tables and columns to the charsets / collations described in a desired-state file",
+    'watch': "Keep running, and automatically convert new / changed tables which don't match the policy while they're small",
 }
 
 
+def _journal(opts, database=None) -> Optional[journal.Journal]:
+    if is_true(getattr(opts, 'no_journal', False)) or not settings.JOURNAL:
+        return None
+    # Passing the database saves a 'SELECT DATABASE()' round trip per journaled change
+    jr = journal.Journal(database=empty_if(database, None, itr=True))
+    print(f"\n{BLUE} >>> Saving original table/column definitions to journal: {jr.filename}")
+    print(f" >>> To undo this run, use: {sys.argv[0]} revert {jr.run_id}{RESET}\n")
+    return jr
+
+
 def list_tables(opts):
     db = empty_if(opts.db, settings.DB_NAME, itr=True)
     print("\nTable list for database:", db, "\n")
@@ -113,6 +129,29 @@ def list_cols(opts):
     print(tline)
 
 
+def _fetch_catalog(db) -> Optional[core.CatalogSnapshot]:
+    """In remote mode, fetch the server version, variables, tables and columns in one round trip"""
+    if not settings.REMOTE:
+        return None
+    catalog = core.fetch_catalog(db)
+    print(f"\n{BLUE} >>> Remote mode: fetched catalog in 1 round trip. Server version: {catalog.version} - "
+          + ', '.join(f"{k}={v}" for k, v in catalog.variables.items()) + RESET)
+    return catalog
+
+
+def print_round_trips(round_trips: dict):
+    if not settings.REMOTE or len(round_trips) == 0:
+        return
+    print("\nRound trips per table:\n")
+    tline = spaceize(2, 41)
+    print(tline)
+    print(columnize('Table', 'Round Trips'))
+    print(tline)
+    for table, count in round_trips.items():
+        print(columnize(table, count))
+    print(tline)
+
+
 def convert_tables(opts):
     db = empty_if(opts.db, settings.DB_NAME, itr=True)
     tables = empty_if(opts.tables, [], itr=True)
@@ -122,7 +161,7 @@ def convert_tables(opts):
     skip_indexed = is_true(opts.skip_indexed)
     
     if not empty(db):
-        core.reconnect(database=db)
+        core.use_database(db)
     
     charset, collation = empty_if(opts.charset, 'utf8mb4', itr=True), empty_if(opts.collation, 'utf8mb4_unicode_ci', itr=True)
     # table = empty_if(opts.table, None, itr=True)
@@ -136,28 +175,44 @@ def convert_tables(opts):
     else:
         core.set_logging_level(env('LOG_LEVEL', 'INFO'))
     
+    catalog = _fetch_catalog(db)
     if all_tables:
-        tables = core.get_tables(database=db)
+        tables = core.get_tables(database=db) if catalog is None else catalog.tables
         tnames = [t.table for t in tables]
         print(YELLOW)
         print(f" >>> --all-tables was specified. Converting {len(tables)} tables! The tables are: {', '.join(tnames)}")
         print(RESET)
     else:
-        tables = [core.get_tables(database=db, table=t)[0] for t in tables]
+        if catalog is None:
+            found = [r for t in tables for r in core.get_tables(database=db, table=t)]
+        else:
+            found = [t for t in catalog.tables if t.table in tables]
+        missing = [t for t in tables if t not in [f.table for f in found]]
+        if len(missing) > 0:
+            parser.error(f"\n{RED}ERROR: Tables not found in database '{db}': {', '.join(missing)}{RESET}\n")
+            return sys.exit(1)
+        tables = found
         tnames = [t.table for t in tables]
     
+    scan = _prescan(opts, db, tnames, charset=charset, collation=collation, skip_indexed=skip_indexed) if conv_columns else None
+    jr = _journal(opts, database=db)
+    round_trips = {}
     for t in tables:
         print(f"\n{YELLOW} [...] Converting table {t.table} to charset {charset} and collation {collation}{RESET}\n")
-        core.convert_table(t.table, charset=charset, collation=collation)
+        start_rtt = core.round_trips()
+        core.convert_table(t.table, charset=charset, collation=collation, journal=jr)
+        round_trips[t.table] = core.round_trips() - start_rtt
         print(f"\n{GREEN} [+++] Successfully converted table {t.table}{RESET}\n")
 
     if conv_columns:
         print(f"\n{BLUE} >>> Converting COLUMNS to charset {charset} and collation {collation} for tables: {', '.join(tnames)}{RESET}\n")
         _convert_columns(
-            tables, charset=charset, collation=collation, outer_tx=outer_tx, skip_indexed=skip_indexed
+            tables, charset=charset, collation=collation, outer_tx=outer_tx, skip_indexed=skip_indexed, journal=jr,
+            prescan=scan, catalog=catalog, round_trips=round_trips
         )
         print(f"\n{GREEN} [+++] Successfully converted COLUMNS inside of tables: {', '.join(tnames)}{RESET}\n")
     
+    print_round_trips(round_trips)
     print(f"\n{GREEN} ++++++ Successfully converted {len(tables)} tables ++++++ {RESET}\n")
 
 
@@ -166,6 +221,10 @@ def _convert_columns(tables: List[core.TableResult], all_cols=True, charset="utf
     columns = empty_if(kwargs.get('columns'), [], itr=True)
     outer_tx = is_true(kwargs.get('outer_tx', True))
     skip_indexed = is_true(kwargs.get('skip_indexed', True))
+    jr = kwargs.get('journal')
+    scan = kwargs.get('prescan')
+    catalog: Optional[core.CatalogSnapshot] = kwargs.get('catalog')
+    round_trips = kwargs.get('round_trips', {})
     # all_cols = is_true(opts.all_columns)
     
     tnames = [t.table for t in tables]
@@ -173,10 +232,13 @@ def _convert_columns(tables: List[core.TableResult], all_cols=True, charset="utf
     for t in tables:
         print(f"{CYAN}    [-] Converting columns in table {t.table} to charset {charset} and collation {collation}{RESET}")
         try:
+            start_rtt = core.round_trips()
             core.convert_columns(
                 t.table, *columns, conv_all=all_cols, charset=charset, collation=collation,
-                use_tx=outer_tx, skip_indexed=skip_indexed, database=db
+                use_tx=outer_tx, skip_indexed=skip_indexed, database=db, journal=jr, prescan=scan,
+                cols=None if catalog is None else catalog.table_columns(t.table)
             )
+            round_trips[t.table] = round_trips.get(t.table, 0) + core.round_trips() - start_rtt
             print(f"{GREEN}    [+] Finished converting columns in table {t.table}{RESET}\n")
 
         except Exception as e:
@@ -197,7 +259,7 @@ def convert_columns(opts):
     all_cols = is_true(opts.all_columns)
     
     if not empty(db):
-        core.reconnect(database=db)
+        core.use_database(db)
     
     if empty(table) and not all_tables:
         parser.error(f"\n{RED}ERROR: You must specify a table to 'convert_columns' without -a / --all-tables{RESET}\n")
@@ -211,27 +273,291 @@ def convert_columns(opts):
         core.set_logging_level()
     else:
         core.set_logging_level(env('LOG_LEVEL', 'INFO'))
+    scan = _prescan(
+        opts, db, [] if all_tables else [table], columns=None if all_cols else columns,
+        charset=charset, collation=collation, skip_indexed=skip_indexed
+    )
+    jr = _journal(opts, database=db)
+    catalog = _fetch_catalog(db)
+    round_trips = {}
     if all_tables:
-        tables = core.get_tables(db)
+        tables = core.get_tables(db) if catalog is None else catalog.tables
         _convert_columns(
             tables, all_cols, charset=charset, collation=collation,
-            db=db, columns=columns, outer_tx=outer_tx, skip_indexed=skip_indexed
+            db=db, columns=columns, outer_tx=outer_tx, skip_indexed=skip_indexed, journal=jr, prescan=scan,
+            catalog=catalog, round_trips=round_trips
         )
+        print_round_trips(round_trips)
         return
     
     print(f"\n >>> Converting columns in table {table} to charset {charset} and collation {collation}\n")
 
     try:
+        start_rtt = core.round_trips()
         core.convert_columns(
             table, *columns, conv_all=all_cols, charset=charset, collation=collation,
-            use_tx=outer_tx, skip_indexed=skip_indexed, database=db
+            use_tx=outer_tx, skip_indexed=skip_indexed, database=db, journal=jr, prescan=scan,
+            cols=None if catalog is None else catalog.table_columns(table)
         )
+        round_trips[table] = core.round_trips() - start_rtt
+        print_round_trips(round_trips)
         print(f"\n [+++] Finished converting {table}.\n")
     except Exception as e:
         log.exception("Error while converting columns in table %s - %s - %s", table, type(e), str(e))
         return sys.exit(1)
 
 
+def print_prescan_report(results: dict, col_size=18):
+    headers = ['Table', 'Column', 'Type', 'Rows', 'Max Bytes', 'Max Chars', 'Target Bytes', 'Non-ASCII', 'Lossy', 'Verdict', 'Action']
+    tline = spaceize(len(headers), col_size + 1)
+    print(tline)
+    print(columnize(*headers, size=col_size))
+    print(tline)
+    for st in results.values():
+        colour = {'lossy': RED, 'overflow': YELLOW}.get(st.verdict, GREEN)
+        action = st.action if empty(st.promote_to) else f"{st.action} ({st.promote_to})"
+        print(colour + columnize(
+            st.table, st.column, st.data_type, st.rows, st.max_length, st.max_char_length, st.max_target_length,
+            st.non_ascii, st.lossy, st.verdict, action, size=col_size
+        ) + RESET)
+    print(tline)
+
+
+def _check_prescan_args(opts, db):
+    if empty(db):
+        parser.error(f"\n{RED}ERROR: You must specify a database with --db / DB_NAME to prescan{RESET}\n")
+        return sys.exit(1)
+    if opts.chunk_size < 1 or opts.workers < 1:
+        parser.error(f"\n{RED}ERROR: --chunk-size and --workers must be at least 1{RESET}\n")
+        return sys.exit(1)
+
+
+def _prescan(opts, db, tables: List[str], columns: List[str] = None, **kwargs) -> Optional[dict]:
+    """Run the prescan for convert_tables / convert_columns if --prescan was passed, and print the results"""
+    if not is_true(getattr(opts, 'prescan', False)):
+        return None
+    _check_prescan_args(opts, db)
+    print(f"\n{BLUE} >>> Prescanning column data using {opts.workers} connections...{RESET}\n")
+    results = prescan.prescan(
+        db, tables=tables, columns=columns, workers=opts.workers, chunk_size=opts.chunk_size,
+        on_lossy=opts.on_lossy, on_overflow=opts.on_overflow, **kwargs
+    )
+    print_prescan_report(results)
+    return results
+
+
+def prescan_columns(opts):
+    db = empty_if(opts.db, settings.DB_NAME, itr=True)
+    charset, collation = empty_if(opts.charset, 'utf8mb4', itr=True), empty_if(opts.collation, 'utf8mb4_unicode_ci', itr=True)
+    _check_prescan_args(opts, db)
+    print(f"\nPrescanning column data in database {db} for conversion to {charset} / {collation}\n")
+    results = prescan.prescan(
+        db, tables=empty_if(opts.tables, [], itr=True), columns=empty_if(opts.columns, [], itr=True),
+        charset=charset, collation=collation, skip_indexed=is_true(opts.skip_indexed), workers=opts.workers,
+        chunk_size=opts.chunk_size, on_lossy=opts.on_lossy, on_overflow=opts.on_overflow
+    )
+    print_prescan_report(results)
+
+
+def print_status_report(statuses: List[TableStatus], col_size=24):
+    headers = ['Host', 'Table', 'Status', 'Steps', 'Time (s)', 'Round Trips', 'Error']
+    tline = spaceize(len(headers), col_size + 1)
+    print(tline)
+    print(columnize(*headers, size=col_size))
+    print(tline)
+    for s in statuses:
+        colour = GREEN if s.status in ['ok', 'noop'] else RED
+        print(colour + columnize(
+            s.host, s.table, s.status, f"{s.done}/{s.total}", f"{s.elapsed:.2f}", s.round_trips, empty_if(s.error, ''),
+            size=col_size
+        ) + RESET)
+    print(tline)
+
+
+def _load_inventory(filename: str) -> fleet.Inventory:
+    try:
+        return fleet.load_inventory(filename)
+    except AttributeError as e:
+        parser.error(f"\n{RED}ERROR: Invalid inventory {filename} - {str(e)}{RESET}\n")
+        return sys.exit(1)
+
+
+def fleet_convert(opts):
+    tables = empty_if(opts.tables, [], itr=True)
+    columns = empty_if(opts.columns, [], itr=True)
+    all_tables = is_true(opts.all_tables)
+    conv_columns = is_true(opts.conv_columns) or not empty(columns, itr=True)
+    charset, collation = empty_if(opts.charset, 'utf8mb4', itr=True), empty_if(opts.collation, 'utf8mb4_unicode_ci', itr=True)
+
+    if empty(tables, itr=True) and not all_tables:
+        parser.error(f"\n{RED}ERROR: You must specify a table to 'fleet' or pass --all-tables / -a{RESET}\n")
+        return sys.exit(1)
+
+    inventory = _load_inventory(opts.inventory)
+    unknown = [h for h in empty_if(opts.hosts, [], itr=True) if h not in inventory.names]
+    if len(unknown) > 0:
+        parser.error(f"\n{RED}ERROR: Host(s) {', '.join(unknown)} are not in the inventory {opts.inventory} - "
+                     f"valid hosts are: {', '.join(inventory.names)}{RESET}\n")
+        return sys.exit(1)
+    print(f"\n{YELLOW} >>> Loaded {len(inventory.hosts)} hosts from {opts.inventory}. "
+          f"Planning against reference host {inventory.reference_host.name}{RESET}\n")
+    plan = fleet.plan_fleet(
+        inventory, tables=tables, conv_tables=not is_true(opts.no_tables), conv_columns=conv_columns, columns=columns,
+        charset=charset, collation=collation, skip_indexed=is_true(opts.skip_indexed)
+    )
+
+    for tp in plan.tables:
+        print(f"{CYAN}    [-] {tp.table}: {len(tp.steps)} statements, {len(tp.skipped)} skipped columns{RESET}")
+        for step in tp.steps:
+            print(f"        {step.statement}")
+    print(f"\n{YELLOW} >>> Plan contains {plan.total_steps} statements across {len(plan.tables)} tables{RESET}\n")
+
+    if is_true(opts.dry_run):
+        print(f"{GREEN} [+++] Dry run - not executing the plan.{RESET}\n")
+        return
+
+    run_id = None
+    if not is_true(opts.no_journal) and settings.JOURNAL:
+        run_id = journal.new_run_id()
+        print(f"{BLUE} >>> Saving original table/column definitions to journal run {run_id}")
+        print(f" >>> To undo this run, use: {sys.argv[0]} revert --inventory {opts.inventory} {run_id}{RESET}\n")
+    statuses = fleet.run_plan(inventory, plan, hosts=empty_if(opts.hosts, [], itr=True), run_id=run_id)
+    print_status_report(statuses)
+    failed = [s for s in statuses if s.status == 'failed']
+    if len(failed) > 0:
+        print(f"\n{RED} [!!!] {len(failed)} of {len(statuses)} host/table conversions failed.{RESET}\n")
+        return sys.exit(1)
+    print(f"\n{GREEN} ++++++ Successfully ran plan on {len(statuses)} host/table pairs ++++++ {RESET}\n")
+
+
+def converge(opts):
+    desired = state.load_state(opts.state_file)
+    print(f"\n{YELLOW} >>> Computing changes needed for schemas {', '.join(desired.schemas)} "
+          f"from {len(desired.rules)} rules in {opts.state_file}{RESET}\n")
+    plan = state.converge(desired)
+    changes = [tp for tp in plan.tables if len(tp.steps) > 0]
+    for tp in plan.tables:
+        for sk in tp.skipped:
+            print(f"{YELLOW}    [!] Skipping column {tp.schema}.{tp.table}.{sk.column} - {sk.reason}{RESET}")
+    for tp in changes:
+        print(f"{CYAN}    [-] {tp.schema}.{tp.table}:{RESET}")
+        for step in tp.steps:
+            print(f"        {step.statement}")
+    if len(changes) == 0:
+        print(f"\n{GREEN} [+++] All {len(plan.tables)} tables already match the desired state.{RESET}\n")
+        return
+    print(f"\n{YELLOW} >>> {len(changes)} of {len(plan.tables)} tables need changing{RESET}\n")
+    if is_true(opts.dry_run):
+        print(f"{GREEN} [+++] Dry run - not converging.{RESET}\n")
+        return
+
+    plan.tables = changes
+    run_id = None
+    if not is_true(opts.no_journal) and settings.JOURNAL:
+        run_id = journal.new_run_id()
+        print(f"{BLUE} >>> Saving original table/column definitions to journal run {run_id}")
+        print(f" >>> To undo this run, use: {sys.argv[0]} revert {run_id}{RESET}\n")
+    statuses = fleet.run_plans(fleet.local_inventory(opts.workers), {settings.DB_HOST: plan}, run_id=run_id)
+    print_status_report(statuses)
+    failed = [s for s in statuses if s.status == 'failed']
+    if len(failed) > 0:
+        print(f"\n{RED} [!!!] {len(failed)} of {len(statuses)} tables failed to converge.{RESET}\n")
+        return sys.exit(1)
+    print(f"\n{GREEN} ++++++ Successfully converged {len(statuses)} tables ++++++ {RESET}\n")
+
+
+def watch_tables(opts):
+    if not empty(opts.state_file):
+        desired = state.load_state(opts.state_file)
+    else:
+        db = empty_if(opts.db, settings.DB_NAME, itr=True)
+        if empty(db):
+            parser.error(f"\n{RED}ERROR: You must pass a state file, or specify a database with --db / DB_NAME to 'watch'{RESET}\n")
+            return sys.exit(1)
+        desired = state.DesiredState(schemas=[db], defaults=state.Target(opts.charset, opts.collation))
+    limits = watch.WatchLimits(
+        max_rows=opts.max_rows, max_bytes=opts.max_bytes, max_threads_running=opts.max_threads_running
+    )
+    watcher = watch.Watcher(
+        desired, limits=limits, interval=opts.interval, dry_run=is_true(opts.dry_run),
+        journal=not is_true(opts.no_journal) and settings.JOURNAL, convert_existing=is_true(opts.convert_existing)
+    )
+    if watcher.journal and not watcher.dry_run:
+        print(f"{BLUE} >>> Each conversion is journaled under its own run ID (shown in the log and /actions)")
+        print(f" >>> To undo one, use: {sys.argv[0]} revert <run_id>{RESET}")
+    if not empty(opts.listen):
+        host, _, port = opts.listen.rpartition(':')
+        watch.serve(watcher, host=empty_if(host, '127.0.0.1'), port=int(port))
+        print(f"{BLUE} >>> Serving metrics on http://{opts.listen}/metrics and recent actions on http://{opts.listen}/actions{RESET}")
+    print(f"{YELLOW} >>> Watching schemas {', '.join(desired.schemas)} every {opts.interval} seconds. Press CTRL-C to stop.{RESET}\n")
+    try:
+        watcher.run_forever()
+    except KeyboardInterrupt:
+        watcher.stop()
+        print(f"\n{GREEN} [+++] Stopped watching.{RESET}\n")
+
+
+def list_runs(opts):
+    runs = journal.list_runs()
+    print(f"\nJournal runs in {settings.JOURNAL_DIR}:\n")
+    headers = ['Run ID', 'Last Modified', 'Entries']
+    tline = spaceize(len(headers), 31)
+    print(tline)
+    print(columnize(*headers, size=30))
+    print(tline)
+    for run_id, modified, count in runs:
+        print(columnize(run_id, modified.strftime('%Y-%m-%d %H:%M:%S'), count, size=30))
+    print(tline)
+
+
+def revert(opts):
+    if is_true(opts.list_runs) or empty(opts.run_id):
+        return list_runs(opts)
+    tables = empty_if(opts.tables, [], itr=True)
+    columns = empty_if(opts.columns, [], itr=True)
+    workers = empty_if(opts.workers, None)
+
+    plans = journal.build_reverts(opts.run_id, tables=tables, columns=columns)
+    if len(plans) == 0:
+        print(f"\n{YELLOW} >>> Nothing to revert for run {opts.run_id}{RESET}\n")
+        return
+    for host, plan in plans.items():
+        print(f"\n{CYAN}    [-] Reverting {len(plan.tables)} tables on host {host}:{RESET}")
+        for tp in plan.tables:
+            for step in tp.steps:
+                print(f"        {step.statement}")
+    print()
+    if is_true(opts.dry_run):
+        print(f"{GREEN} [+++] Dry run - not executing the revert.{RESET}\n")
+        return
+
+    if not empty(opts.inventory):
+        inventory = _load_inventory(opts.inventory)
+        unknown = [h for h in plans.keys() if h not in inventory.names]
+        if len(unknown) > 0:
+            parser.error(f"\n{RED}ERROR: Run {opts.run_id} was made against host(s) {', '.join(unknown)} which are "
+                         f"not in the inventory {opts.inventory}{RESET}\n")
+            return sys.exit(1)
+    else:
+        unknown = [h for h in plans.keys() if h != settings.DB_HOST]
+        if len(unknown) > 0:
+            parser.error(f"\n{RED}ERROR: Run {opts.run_id} was made against host(s) {', '.join(unknown)} - "
+                         f"use '-s' to connect to that host, or pass '--inventory' for fleet runs{RESET}\n")
+            return sys.exit(1)
+        inventory = fleet.local_inventory()
+    if workers is not None:
+        for h in inventory.hosts:
+            h.concurrency = max(1, int(workers))
+
+    statuses = fleet.run_plans(inventory, plans)
+    print_status_report(statuses)
+    failed = [s for s in statuses if s.status == 'failed']
+    if len(failed) > 0:
+        print(f"\n{RED} [!!!] {len(failed)} of {len(statuses)} table reverts failed.{RESET}\n")
+        return sys.exit(1)
+    print(f"\n{GREEN} ++++++ Successfully reverted {len(statuses)} tables from run {opts.run_id} ++++++ {RESET}\n")
+
+
 helptext = f"""
 {YELLOW}Basic Info:{RESET}
     
@@ -315,6 +641,9 @@ helptext = f"""
     {CYAN}# Alternative with more verbose/explicit -- arguments{RESET}
     {sys.argv[0]} --host mysql.example.org --user johndoe --pass MySecur3p@w0rd --database shop_db --port 33306 list_tables
 
+    {CYAN}# Use remote-optimised mode (-R) when the server is far away - fewer round trips, with a per-table round trip report{RESET}
+    {sys.argv[0]} -R -s mysql.example.org convert_tables -a -k
+
     {CYAN}# List all columns for every table in the current database{RESET}
     {sys.argv[0]} list_columns
 
@@ -343,6 +672,54 @@ helptext = f"""
     {CYAN}# Convert the charset + collation for ALL columns on every table in the database (but don't convert the tables themselves){RESET}
     {sys.argv[0]} convert_columns -k -a
 
+    {CYAN}# Scan the data of every column that would be converted - showing which are pure ASCII, would outgrow their
+    # TEXT type in utf8mb4, or contain characters which can't be represented in utf8mb4{RESET}
+    {sys.argv[0]} prescan -w 8
+
+    {CYAN}# Prescan before converting: skip lossy columns, and promote columns which would overflow (e.g. TEXT -> MEDIUMTEXT){RESET}
+    {sys.argv[0]} convert_tables -a -k --prescan
+
+    {GREEN} --- Desired state ---{RESET}
+
+    {CYAN}# Show the ALTERs needed to converge the server to the rules in state.yml (one ALTER per table at most){RESET}
+    {sys.argv[0]} converge state.yml --dry-run
+
+    {CYAN}# Converge, altering up to 4 tables at once{RESET}
+    {sys.argv[0]} converge -w 4 state.yml
+
+    {GREEN} --- Watching for new tables ---{RESET}
+
+    {CYAN}# Poll every 30 seconds, converting new/changed tables in DB_NAME with the wrong collation while they're small{RESET}
+    {sys.argv[0]} watch --interval 30 --max-rows 100000
+
+    {CYAN}# Same, but using the rules in a desired-state file, and serving metrics on port 9330{RESET}
+    {sys.argv[0]} watch state.yml --listen 127.0.0.1:9330
+
+    {GREEN} --- Fleet (many servers) Commands ---{RESET}
+
+    {CYAN}# Plan against the reference server in fleet.yml, then convert all tables + columns on every server in parallel{RESET}
+    {sys.argv[0]} fleet fleet.yml -a -k
+
+    {CYAN}# Only show the plan (statements which would be run) without running it{RESET}
+    {sys.argv[0]} fleet fleet.yml -a -k --dry-run
+
+    {GREEN} --- Undoing conversions ---{RESET}
+
+    {CYAN}# Conversions can't be rolled back (MySQL commits DDL implicitly), so the original table/column definitions are
+    # saved to a journal in JOURNAL_DIR ({settings.JOURNAL_DIR}) before each change.{RESET}
+
+    {CYAN}# List journal runs{RESET}
+    {sys.argv[0]} revert --list
+
+    {CYAN}# Undo a run, reverting up to 4 tables at once{RESET}
+    {sys.argv[0]} revert -w 4 20201020-101500-a1b2c3
+
+    {CYAN}# Undo just the 'email' column of the 'auth_user' table from a run{RESET}
+    {sys.argv[0]} revert 20201020-101500-a1b2c3 -t auth_user -c email
+
+    {CYAN}# Undo a fleet run on every host{RESET}
+    {sys.argv[0]} revert --inventory fleet.yml 20201020-101500-a1b2c3
+
 {YELLOW}Copyright:{RESET}
 {MAGENTA}
     +===================================================+
@@ -372,10 +749,13 @@ def _configure(opts):
     settings.DB_NAME = opts.database
     settings.DB_PORT = int(opts.port)
     settings.QUIET = is_true(opts.quiet)
+    settings.REMOTE = is_true(opts.remote)
     if settings.QUIET:
         settings.LOG_LEVEL = env('LOG_LEVEL', 'ERROR')
         core.set_logging_level('ERROR')
-    core.reconnect()
+    # Sub-commands which manage their own connections (e.g. 'fleet') set connect=False
+    if getattr(opts, 'connect', True):
+        core.reconnect()
 
 
 # noinspection PyTypeChecker
@@ -396,6 +776,9 @@ mparser.add_argument('-P', '--port', default=settings.DB_PORT, type=int,
                      help=f'Port number of database server. Default: {settings.DB_PORT}')
 mparser.add_argument('-q', '--quiet', default=settings.QUIET, action='store_true',
                      help=f'Set quiet mode (less spam-like logging)')
+mparser.add_argument('-R', '--remote', default=settings.REMOTE, action='store_true',
+                     help='Remote-optimised mode for high latency servers: compresses the protocol, fetches metadata in one '
+                          'round trip, skips no-op BEGIN/COMMIT around DDL, and reports round trips per table')
 
 # Take any args passed to the main parser and override `settings` + reconnect DB
 
@@ -419,6 +802,21 @@ parse_lc.set_defaults(func=list_cols)
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
+
+def _add_prescan_args(p: argparse.ArgumentParser, flag=False):
+    if flag:
+        p.add_argument('--prescan', dest='prescan', action='store_true', default=False,
+                       help='Scan the data of each column before converting, to skip / promote columns which would lose or truncate data')
+    p.add_argument('-w', '--workers', dest='workers', default=4, type=int,
+                   help='Number of connections to use for prescanning column data (default: 4)')
+    p.add_argument('--chunk-size', dest='chunk_size', default=100000, type=int,
+                   help='Number of rows scanned per query (by primary key) when prescanning (default: 100000)')
+    p.add_argument('--on-lossy', dest='on_lossy', default='skip', choices=prescan.ON_LOSSY,
+                   help='What to do with columns containing characters the target charset cannot represent (default: skip)')
+    p.add_argument('--on-overflow', dest='on_overflow', default='promote', choices=prescan.ON_OVERFLOW,
+                   help='What to do with TEXT columns whose data would outgrow the type in the target charset (default: promote)')
+
+
 parse_ct = sp.add_parser('convert_tables', description=CMD_DESC['convert_table'])
 parse_ct.add_argument('tables', default=[], help='MySQL tables to convert', nargs='*')
 parse_ct.add_argument('--db', default=None, help='MySQL database to use instead of DB_NAME', nargs='?')
@@ -433,6 +831,11 @@ parse_ct.add_argument('--no-tx', dest='outer_tx', action='store_false', default=
 parse_ct.add_argument('-i', '--indexes', dest='skip_indexed', action='store_false', default=True,
                       help='Attempt to convert columns which have an index (indexed columns are skipped by default to prevent errors)')
 
+parse_ct.add_argument('--no-journal', dest='no_journal', action='store_true', default=False,
+                      help='Do not save the original table/column definitions to the journal (disables revert)')
+
+_add_prescan_args(parse_ct, flag=True)
+
 parse_ct.set_defaults(func=convert_tables, all_tables=False, outer_tx=True, skip_indexed=True)
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
@@ -451,13 +854,112 @@ parse_cc.add_argument('-a', '--all-tables', dest='all_tables', action='store_tru
                       help='Convert ALL tables in the database (should be specified with -c (all columns))')
 parse_cc.add_argument('-k', '--all-columns', dest='all_columns', action='store_true', default=False,
                       help='Convert ALL columns on the table(s) being converted')
+parse_cc.add_argument('--no-journal', dest='no_journal', action='store_true', default=False,
+                      help='Do not save the original table/column definitions to the journal (disables revert)')
 
 # ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
 
+_add_prescan_args(parse_cc, flag=True)
+
 parse_cc.set_defaults(
     func=convert_columns, outer_tx=True, skip_indexed=True, all_tables=False, all_columns=False
 )
 
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parse_fl = sp.add_parser('fleet', description=CMD_DESC['fleet'])
+parse_fl.add_argument('inventory', help='Inventory file (YAML / TOML / JSON) listing the servers to convert')
+parse_fl.add_argument('tables', default=[], help='MySQL tables to convert', nargs='*')
+parse_fl.add_argument('-a', '--all-tables', action='store_true', dest='all_tables', default=False,
+                      help='Convert ALL tables in the reference server\'s database')
+parse_fl.add_argument('-k', '--convert-cols', action='store_true', dest='conv_columns', default=False,
+                      help='Convert all columns within the table(s) to the selected character set + collation')
+parse_fl.add_argument('-c', '--columns', dest='columns', default=[], help='Only convert these columns (implies -k)', nargs='*')
+parse_fl.add_argument('-n', '--no-tables', action='store_true', dest='no_tables', default=False,
+                      help='Do not change the default charset / collation of the tables themselves (columns only)')
+parse_fl.add_argument('--hosts', dest='hosts', default=[], nargs='*',
+                      help='Only run the plan on these inventory hosts (default: all hosts)')
+parse_fl.add_argument('--charset', default='utf8mb4', help='Character set to convert to (default: utf8mb4)')
+parse_fl.add_argument('--collation', default='utf8mb4_unicode_ci', help='Collation to convert to (default: utf8mb4_unicode_ci)')
+parse_fl.add_argument('-i', '--indexes', dest='skip_indexed', action='store_false', default=True,
+                      help='Attempt to convert columns which have an index (indexed columns are skipped by default to prevent errors)')
+parse_fl.add_argument('--dry-run', dest='dry_run', action='store_true', default=False,
+                      help='Only print the plan, don\'t run it')
+parse_fl.add_argument('--no-journal', dest='no_journal', action='store_true', default=False,
+                      help='Do not save the original table/column definitions to the journal (disables revert)')
+
+parse_fl.set_defaults(func=fleet_convert, connect=False, all_tables=False, skip_indexed=True, dry_run=False)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parse_ps = sp.add_parser('prescan', description=CMD_DESC['prescan'])
+parse_ps.add_argument('tables', default=[], help='MySQL tables to scan (default: all tables)', nargs='*')
+parse_ps.add_argument('-c', '--columns', dest='columns', default=[], help='Only scan these columns', nargs='*')
+parse_ps.add_argument('--db', default=None, help='MySQL database to use instead of DB_NAME')
+parse_ps.add_argument('--charset', default='utf8mb4', help='Character set the columns would be converted to (default: utf8mb4)')
+parse_ps.add_argument('--collation', default='utf8mb4_unicode_ci', help='Collation the columns would be converted to (default: utf8mb4_unicode_ci)')
+parse_ps.add_argument('-i', '--indexes', dest='skip_indexed', action='store_false', default=True,
+                      help='Also scan columns which have an index (indexed columns are skipped by default)')
+_add_prescan_args(parse_ps)
+
+parse_ps.set_defaults(func=prescan_columns, skip_indexed=True)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parse_cv = sp.add_parser('converge', description=CMD_DESC['converge'])
+parse_cv.add_argument('state_file', help='Desired-state file (YAML / TOML / JSON)')
+parse_cv.add_argument('-w', '--workers', dest='workers', default=1, type=int,
+                      help='Number of tables to alter in parallel (default: 1)')
+parse_cv.add_argument('--dry-run', dest='dry_run', action='store_true', default=False,
+                      help='Only print the ALTER statements needed, don\'t run them')
+parse_cv.add_argument('--no-journal', dest='no_journal', action='store_true', default=False,
+                      help='Do not save the original table/column definitions to the journal (disables revert)')
+
+parse_cv.set_defaults(func=converge, dry_run=False)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parse_wt = sp.add_parser('watch', description=CMD_DESC['watch'])
+parse_wt.add_argument('state_file', default=None, nargs='?',
+                      help='Desired-state file (YAML / TOML / JSON) to use as the policy, instead of --charset / --collation')
+parse_wt.add_argument('--db', default=None, help='MySQL database to watch instead of DB_NAME (when not using a state file)')
+parse_wt.add_argument('--charset', default='utf8mb4', help='Character set tables should use (default: utf8mb4)')
+parse_wt.add_argument('--collation', default='utf8mb4_unicode_ci', help='Collation tables should use (default: utf8mb4_unicode_ci)')
+parse_wt.add_argument('--interval', default=30, type=float, help='Seconds between each catalog poll (default: 30)')
+parse_wt.add_argument('--max-rows', dest='max_rows', default=100000, type=int,
+                      help='Don\'t automatically convert tables with more (estimated) rows than this (default: 100000)')
+parse_wt.add_argument('--max-bytes', dest='max_bytes', default=64 * 1024 * 1024, type=int,
+                      help='Don\'t automatically convert tables larger than this many bytes (default: 64MB)')
+parse_wt.add_argument('--max-threads-running', dest='max_threads_running', default=16, type=int,
+                      help='Defer conversions while the server\'s Threads_running is above this (default: 16)')
+parse_wt.add_argument('--listen', default='127.0.0.1:9330',
+                      help='host:port to serve /metrics and /actions on, or an empty string to disable (default: 127.0.0.1:9330)')
+parse_wt.add_argument('--dry-run', dest='dry_run', action='store_true', default=False,
+                      help='Only report the tables which would be converted, don\'t convert them')
+parse_wt.add_argument('--no-journal', dest='no_journal', action='store_true', default=False,
+                      help='Do not save the original table/column definitions to the journal (disables revert)')
+parse_wt.add_argument('--convert-existing', dest='convert_existing', action='store_true', default=False,
+                      help='Also convert non-compliant tables which already exist when watch starts (by default they\'re only reported)')
+
+parse_wt.set_defaults(func=watch_tables, dry_run=False, convert_existing=False)
+
+# ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- ----- -----
+
+parse_rv = sp.add_parser('revert', description=CMD_DESC['revert'])
+parse_rv.add_argument('run_id', default=None, help='Journal run ID to revert (see --list)', nargs='?')
+parse_rv.add_argument('-l', '--list', dest='list_runs', action='store_true', default=False,
+                      help='List the journal runs which can be reverted')
+parse_rv.add_argument('-t', '--tables', dest='tables', default=[], help='Only revert these tables', nargs='*')
+parse_rv.add_argument('-c', '--columns', dest='columns', default=[], nargs='*',
+                      help='Only revert these columns (table default charset changes are not reverted)')
+parse_rv.add_argument('--inventory', default=None, help='Fleet inventory file, required to revert fleet runs')
+parse_rv.add_argument('-w', '--workers', default=None, type=int,
+                      help='Number of tables to revert in parallel per host (default: 1, or the inventory concurrency)')
+parse_rv.add_argument('--dry-run', dest='dry_run', action='store_true', default=False,
+                      help='Only print the reverse ALTER statements, don\'t run them')
+
+parse_rv.set_defaults(func=revert, connect=False, list_runs=False, dry_run=False)
+
 
 # Resolves the error "'Namespace' object has no attribute 'func'
 # Taken from https://stackoverflow.com/a/54161510/2648583
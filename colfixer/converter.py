@@ -0,0 +1,228 @@
+"""
+Asyncio-native API for running conversion plans from your own Python code.
+
+Blocking database calls are run on a bounded thread pool (with one pooled connection per thread), while progress
+is reported as typed events to hooks registered with :meth:`.Converter.on`::
+
+    >>> from colfixer.converter import Converter
+    >>> async def main():
+    ...     async with Converter(max_workers=4, host='db1.example.com', database='my_app') as conv:
+    ...         conv.on('statement_done', lambda ev: print(ev.table, ev.column, ev.elapsed))
+    ...         plan = await conv.plan('my_app', conv_columns=True)
+    ...         statuses = await conv.run(plan)
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from privex.helpers import empty
+
+from colfixer import core
+from colfixer.plan import Plan, PlanStep, TablePlan, TableStatus, build_plan, run_table
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ConverterEvent:
+    table: str
+    host: Optional[str] = None
+    time: float = field(default_factory=time.time)
+    name = 'event'
+
+
+@dataclass
+class TableStarted(ConverterEvent):
+    statements: int = 0
+    name = 'table_started'
+
+
+@dataclass
+class StatementDone(ConverterEvent):
+    statement: str = ''
+    kind: str = ''
+    column: Optional[str] = None
+    elapsed: float = 0.0
+    """How long the statement took to execute, in seconds"""
+    name = 'statement_done'
+
+
+@dataclass
+class ColumnSkipped(ConverterEvent):
+    column: str = ''
+    reason: str = ''
+    name = 'column_skipped'
+
+
+@dataclass
+class TableFailed(ConverterEvent):
+    error: str = ''
+    status: Optional[TableStatus] = None
+    name = 'table_failed'
+
+
+@dataclass
+class TableFinished(ConverterEvent):
+    status: Optional[TableStatus] = None
+    name = 'table_finished'
+
+
+EVENT_NAMES = [e.name for e in [TableStarted, StatementDone, ColumnSkipped, TableFailed, TableFinished]]
+
+
+class Converter:
+    """
+    Runs :class:`.Plan` objects inside of an asyncio event loop.
+
+    At most ``max_workers`` tables are converted at once, each on its own pooled connection (``conn_override`` is
+    passed to :func:`colfixer.core._connect`, e.g. ``host``, ``user``, ``database``).
+
+    Hooks can be plain functions or coroutines, and receive a single :class:`.ConverterEvent`. Register a hook for
+    ``*`` to receive every event. Exceptions raised by hooks are logged and ignored.
+
+    :meth:`.cancel` (or cancelling the task awaiting :meth:`.run`) stops any further statements from being started -
+    a statement which is already running on the server is left to finish, as interrupting an ALTER part way
+    through isn't safe. Cancelling only affects the current :meth:`.run` - the next call starts afresh.
+    """
+    def __init__(self, max_workers: int = 4, journal=None, host: str = None, **conn_override):
+        self.max_workers = max(1, int(max_workers))
+        self.journal = journal
+        self.host = conn_override.get('host') if empty(host) else host
+        self.pool = core.ConnectionPool(self.max_workers, **conn_override)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='colfixer-converter')
+        self._hooks: Dict[str, List[Callable]] = {}
+        self._cancelled = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hook_tasks = set()
+
+    def on(self, event: str, callback: Callable = None):
+        """Register ``callback`` for the event ``event`` - can also be used as a decorator: ``@conv.on('table_failed')``"""
+        if event != '*' and event not in EVENT_NAMES:
+            raise AttributeError(f"Unknown event '{event}' - valid events are: {', '.join(EVENT_NAMES)}")
+        if callback is None:
+            def _decorator(f):
+                self.on(event, f)
+                return f
+            return _decorator
+        self._hooks.setdefault(event, []).append(callback)
+        return callback
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _dispatch(self, event: ConverterEvent):
+        for cb in self._hooks.get(event.name, []) + self._hooks.get('*', []):
+            try:
+                res = cb(event)
+                if inspect.isawaitable(res):
+                    task = asyncio.ensure_future(res)
+                    self._hook_tasks.add(task)
+                    task.add_done_callback(self._hook_done)
+            except Exception as e:
+                log.exception("Exception in '%s' hook %s - %s - %s", event.name, cb, type(e), str(e))
+
+    def _hook_done(self, task: asyncio.Future):
+        self._hook_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            log.error("Exception in async hook - %s - %s", type(e), str(e))
+
+    def _emit(self, event: ConverterEvent):
+        """Thread-safe - hooks are always called from the event loop's thread"""
+        self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _run_table(self, tp: TablePlan) -> TableStatus:
+        if self.cancelled:
+            return TableStatus(table=tp.table, host=self.host, status='cancelled', total=len(tp.steps))
+
+        def _on_statement(step: PlanStep, elapsed: float):
+            self._emit(StatementDone(
+                tp.table, self.host, statement=step.statement, kind=step.kind, column=step.column, elapsed=elapsed
+            ))
+
+        try:
+            with self.pool.acquire() as conn:
+                self._emit(TableStarted(tp.table, self.host, statements=len(tp.steps)))
+                status = run_table(
+                    tp, conn, host=self.host, journal=self.journal, on_statement=_on_statement, cancelled=self._cancelled
+                )
+        except Exception as e:
+            log.warning("Could not run plan for table %s - %s - %s", tp.table, type(e), str(e))
+            status = TableStatus(table=tp.table, host=self.host, status='failed', total=len(tp.steps), error=str(e))
+
+        if status.status == 'failed':
+            self._emit(TableFailed(tp.table, self.host, error=status.error, status=status))
+        else:
+            self._emit(TableFinished(tp.table, self.host, status=status))
+        return status
+
+    async def _run_table_async(self, tp: TablePlan) -> TableStatus:
+        for sk in tp.skipped:
+            self._dispatch(ColumnSkipped(tp.table, self.host, column=sk.column, reason=sk.reason))
+        if len(tp.steps) == 0:
+            status = TableStatus(table=tp.table, host=self.host, status='noop')
+            self._dispatch(TableFinished(tp.table, self.host, status=status))
+            return status
+        return await self._loop.run_in_executor(self.executor, self._run_table, tp)
+
+    async def plan(self, database=None, **kwargs) -> Plan:
+        """Build a :class:`.Plan` on the thread pool - ``kwargs`` are passed to :func:`colfixer.plan.build_plan`"""
+        def _build():
+            with self.pool.acquire() as conn:
+                return build_plan(database, conn=conn, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, _build)
+
+    async def run(self, plan: Plan) -> List[TableStatus]:
+        """Run every table in ``plan`` (up to ``max_workers`` at once), returning a :class:`.TableStatus` per table"""
+        self._loop = asyncio.get_running_loop()
+        self._cancelled.clear()
+        tasks = [asyncio.ensure_future(self._run_table_async(tp)) for tp in plan.tables]
+        try:
+            statuses = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        if len(self._hook_tasks) > 0:
+            await asyncio.gather(*list(self._hook_tasks), return_exceptions=True)
+        return list(statuses)
+
+    def close(self):
+        self.cancel()
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -21,9 +21,13 @@ Copyright::
 
 
 """
+import re
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Any, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from privex.helpers import empty
 from privex.loghelper import LogHelper
@@ -32,6 +36,7 @@ import logging
 import MySQLdb
 from os import getenv as env
 from MySQLdb.connections import Connection
+from MySQLdb.constants import CLIENT
 
 log = logging.getLogger(__name__)
 
@@ -55,6 +60,8 @@ set_logging_level(settings.LOG_LEVEL)
 @dataclass
 class DataStore:
     connection: Connection = None
+    database: Optional[str] = None
+    """The database currently selected on :attr:`.connection`"""
 
     @property
     def connected(self):
@@ -63,12 +70,31 @@ class DataStore:
 
 STORE = DataStore()
 
+_RTT = threading.local()
+
+
+def count_round_trips(count: int = 1):
+    _RTT.count = getattr(_RTT, 'count', 0) + count
+
+
+def round_trips() -> int:
+    """
+    Number of client <-> server round trips made so far by the current thread. Take the difference between two
+    calls to find how many round trips an operation needed.
+    """
+    return getattr(_RTT, 'count', 0)
+
 
 def _connect(**conn_override) -> Connection:
     conn_args = dict(host=settings.DB_HOST, user=settings.DB_USER, password=settings.DB_PASS, port=settings.DB_PORT)
     if not empty(settings.DB_NAME):
         conn_args['database'] = settings.DB_NAME
+    if settings.REMOTE:
+        # Compress the protocol, and allow sending several statements in one round trip (see fetch_catalog)
+        conn_args['compress'] = True
+        conn_args['client_flag'] = conn_args.get('client_flag', 0) | CLIENT.MULTI_STATEMENTS | CLIENT.MULTI_RESULTS
     conn_args = {**conn_args, **conn_override}
+    count_round_trips()
     return Connection(**conn_args)
 
 
@@ -77,9 +103,25 @@ def connect(new_instance=False, **conn_override) -> Connection:
         return _connect(**conn_override)
     if not STORE.connected:
         STORE.connection = _connect(**conn_override)
+        STORE.database = conn_override.get('database', settings.DB_NAME)
     return STORE.connection
 
 
+def use_database(database: str) -> Connection:
+    """
+    Switch the shared connection to ``database``. In remote mode (``settings.REMOTE``), this is a single
+    ``select_db`` - or nothing at all if it's already selected - rather than a full reconnect.
+    """
+    if not settings.REMOTE:
+        return reconnect(database=database)
+    conn = connect()
+    if STORE.database != database:
+        conn.select_db(database)
+        count_round_trips()
+        STORE.database = database
+    return conn
+
+
 def reconnect(**conn_override) -> Connection:
     disconnect()
     return connect(**conn_override)
@@ -88,30 +130,181 @@ def reconnect(**conn_override) -> Connection:
 def disconnect() -> bool:
     if STORE.connected:
         STORE.connection.close()
-        STORE.connection = None
+        STORE.connection, STORE.database = None, None
         return True
     return False
 
 
-def query(stmt, *params, one=False, use_tx=True, **kwargs) -> Optional[Union[Tuple[Any, ...], str, int, float, bool, Decimal]]:
-    conn = connect()
-    if use_tx: conn.begin()
+class ConnectionPool:
+    """
+    A small thread-safe pool of :class:`.Connection` objects which all share the same connection arguments.
+
+    Connections are opened lazily (never more than ``size`` at once), and :meth:`.acquire` blocks until one is free::
+
+        >>> pool = ConnectionPool(4, host='db1.example.com', database='my_app')
+        >>> with pool.acquire() as conn:
+        ...     tables = get_tables('my_app', conn=conn)
+        >>> pool.close()
+
+    """
+    PING_AFTER = 60
+    """Idle connections which haven't been used for this many seconds are pinged before they're handed out"""
+
+    def __init__(self, size: int = 1, **conn_override):
+        self.size = max(1, int(size))
+        self.conn_override = {k: v for k, v in conn_override.items() if v is not None}
+        self._idle: List[Tuple[Connection, float]] = []
+        """Holds ``(connection, last_used)`` tuples - the most recently used connection is handed out first"""
+        self._opened = 0
+        # Guards _idle + _opened, and wakes up waiting threads when a connection is released OR discarded
+        # (so a waiter can open a replacement for a connection which died)
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _alive(conn: Connection) -> bool:
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn: Connection):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def _release(self, conn: Connection):
+        with self._cond:
+            self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    def _get(self) -> Connection:
+        while True:
+            with self._cond:
+                while len(self._idle) == 0 and self._opened >= self.size:
+                    self._cond.wait()
+                if len(self._idle) > 0:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._opened += 1
+            if conn is None:
+                try:
+                    return _connect(**self.conn_override)
+                except Exception:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+            if time.time() - last_used < self.PING_AFTER or self._alive(conn):
+                return conn
+            # e.g. wait_timeout expired while it sat in the pool - replace it with a fresh connection
+            log.warning("Discarding dead pooled connection to %s", self.conn_override.get('host', settings.DB_HOST))
+            self._discard(conn)
+
+    @contextmanager
+    def acquire(self) -> Connection:
+        conn = self._get()
+        try:
+            yield conn
+        except Exception:
+            # Don't hand a connection which died mid-statement (server gone away, killed etc.) to the next table
+            if self._alive(conn):
+                self._release(conn)
+            else:
+                log.warning("Discarding pooled connection to %s which died mid-statement",
+                            self.conn_override.get('host', settings.DB_HOST))
+                self._discard(conn)
+            raise
+        self._release(conn)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception as e:
+                log.warning("Error while closing pooled connection: %s - %s", type(e), str(e))
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+
+
+def _use_tx(use_tx: bool) -> bool:
+    # This tool only runs SELECTs and DDL - which MySQL/MariaDB commit implicitly - so in remote mode we don't
+    # pay two extra round trips for a BEGIN / COMMIT which can't roll anything back.
+    return use_tx and not settings.REMOTE
+
+
+def begin(conn: Connection):
+    conn.begin()
+    count_round_trips()
+
+
+def commit(conn: Connection):
+    conn.commit()
+    count_round_trips()
+
+
+def rollback(conn: Connection):
+    conn.rollback()
+    count_round_trips()
+
+
+def query(stmt, *params, one=False, use_tx=True, conn: Connection = None, **kwargs) -> Optional[Union[Tuple[Any, ...], str, int, float, bool, Decimal]]:
+    conn = connect() if conn is None else conn
+    use_tx = _use_tx(use_tx)
+    if use_tx: begin(conn)
     
     cur = conn.cursor()
     try:
+        count_round_trips()
         cur.execute(stmt, tuple(list(params)))
         res = cur.fetchone() if one else list(cur.fetchall())
     except Exception as e:
         log.exception("Exception while executing query: '%s' - params: %s", stmt, list(params))
-        if use_tx: conn.rollback()
+        if use_tx: rollback(conn)
         raise e
     finally:
         cur.close()
     
-    if use_tx: conn.commit()
+    if use_tx: commit(conn)
     return res
 
 
+def query_many(*stmts: Tuple[str, List[Any]], conn: Connection = None) -> List[List[tuple]]:
+    """
+    Run several independent ``(statement, params)`` queries, returning a list of rows for each of them.
+
+    In remote mode (``settings.REMOTE``) the statements are pipelined, i.e. sent as ONE multi-statement query and
+    read back with ``nextset()`` - costing one round trip instead of one per statement.
+    """
+    conn = connect() if conn is None else conn
+    if not settings.REMOTE:
+        return [query(stmt, *params, use_tx=False, conn=conn) for stmt, params in stmts]
+    sql = ' '.join(stmt if stmt.rstrip().endswith(';') else stmt + ';' for stmt, _ in stmts)
+    params = [p for _, ps in stmts for p in ps]
+    cur = conn.cursor()
+    results = []
+    try:
+        count_round_trips()
+        cur.execute(sql, tuple(params))
+        results.append(list(cur.fetchall()))
+        while cur.nextset():
+            results.append(list(cur.fetchall()))
+    except Exception as e:
+        log.exception("Exception while executing multi-statement query: '%s' - params: %s", sql, params)
+        raise e
+    finally:
+        cur.close()
+    return results
+
+
 @dataclass
 class TableResult:
     schema: str
@@ -120,13 +313,11 @@ class TableResult:
     character_set: str
 
 
-def get_tables(database=None, table=None):
-    """
-    SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_COLLATION
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_NAME = 't_name'
-    :return:
-    """
+class TableNotFound(Exception):
+    pass
+
+
+def _tables_query(database=None, table=None) -> Tuple[str, List[str]]:
     stmt = "SELECT T.TABLE_SCHEMA, T.TABLE_NAME, T.TABLE_COLLATION, CCSA.CHARACTER_SET_NAME " \
            "FROM INFORMATION_SCHEMA.TABLES T, INFORMATION_SCHEMA.COLLATION_CHARACTER_SET_APPLICABILITY CCSA " \
            "WHERE CCSA.collation_name = T.TABLE_COLLATION"
@@ -140,7 +331,18 @@ def get_tables(database=None, table=None):
         stmt += " AND T.TABLE_NAME = %s"
         params += [table]
     stmt += ';'
-    return [TableResult(*r) for r in query(stmt, *params)]
+    return stmt, params
+
+
+def get_tables(database=None, table=None, conn: Connection = None) -> List[TableResult]:
+    """
+    SELECT TABLE_SCHEMA, TABLE_NAME, TABLE_COLLATION
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_NAME = 't_name'
+    :return:
+    """
+    stmt, params = _tables_query(database, table)
+    return [TableResult(*r) for r in query(stmt, *params, conn=conn)]
 
 
 @dataclass
@@ -159,13 +361,7 @@ class TableColumnResult:
     character_set: str
     
 
-def get_columns(database=None, table=None):
-    """
-    SELECT COL.TABLE_SCHEMA, COL.TABLE_NAME, COL.COLUMN_NAME, COL.COLLATION_NAME, CCSA.CHARACTER_SET_NAME
-    FROM INFORMATION_SCHEMA.COLUMNS COL, INFORMATION_SCHEMA.COLLATION_CHARACTER_SET_APPLICABILITY CCSA
-WHERE CCSA.collation_name = COL.COLLATION_NAME TABLE_NAME = 't_name';
-    :return:
-    """
+def _columns_query(database=None, table=None) -> Tuple[str, List[str]]:
     cols = [
         'TABLE_SCHEMA', 'TABLE_NAME', 'COLUMN_NAME', 'COLUMN_DEFAULT', 'IS_NULLABLE', 'DATA_TYPE',
         'CHARACTER_MAXIMUM_LENGTH', 'COLUMN_TYPE', 'COLUMN_KEY', 'EXTRA', 'COLLATION_NAME', 'CHARACTER_SET_NAME'
@@ -182,20 +378,149 @@ WHERE CCSA.collation_name = COL.COLLATION_NAME TABLE_NAME = 't_name';
         stmt += " TABLE_NAME = %s"
         params += [table]
     stmt += ';'
-    return [TableColumnResult(*r) for r in query(stmt, *params)]
+    return stmt, params
 
 
-def convert_table(table: str, charset="utf8mb4", collation="utf8mb4_unicode_ci", use_tx=True):
-    # stmt = f"ALTER TABLE {table} CONVERT TO CHARACTER SET {charset} COLLATE {collation};"
-    stmt = f"ALTER TABLE {table} DEFAULT CHARACTER SET {charset} DEFAULT COLLATE {collation};"
-    
-    return query(stmt, use_tx=use_tx)
+def get_columns(database=None, table=None, conn: Connection = None) -> List[TableColumnResult]:
+    """
+    SELECT COL.TABLE_SCHEMA, COL.TABLE_NAME, COL.COLUMN_NAME, COL.COLLATION_NAME, CCSA.CHARACTER_SET_NAME
+    FROM INFORMATION_SCHEMA.COLUMNS COL, INFORMATION_SCHEMA.COLLATION_CHARACTER_SET_APPLICABILITY CCSA
+WHERE CCSA.collation_name = COL.COLLATION_NAME TABLE_NAME = 't_name';
+    :return:
+    """
+    stmt, params = _columns_query(database, table)
+    return [TableColumnResult(*r) for r in query(stmt, *params, conn=conn)]
+
+
+@dataclass
+class CatalogSnapshot:
+    version: str
+    variables: Dict[str, str]
+    tables: List[TableResult]
+    columns: List[TableColumnResult]
+
+    def table_columns(self, table: str) -> List[TableColumnResult]:
+        return [c for c in self.columns if c.table == table]
+
+
+SERVER_VARIABLES = ['character_set_server', 'collation_server', 'character_set_database', 'collation_database']
+
+
+def fetch_catalog(database=None, table=None, conn: Connection = None) -> CatalogSnapshot:
+    """
+    Fetch the server version, charset-related server variables, tables and columns together. In remote mode this
+    is a single round trip (see :func:`.query_many`).
+    """
+    var_stmt = f"SELECT {', '.join('@@' + v for v in SERVER_VARIABLES)};"
+    version, variables, tables, columns = query_many(
+        ("SELECT VERSION();", []),
+        (var_stmt, []),
+        _tables_query(database, table),
+        _columns_query(database, table),
+        conn=conn
+    )
+    return CatalogSnapshot(
+        version=version[0][0], variables=dict(zip(SERVER_VARIABLES, variables[0])),
+        tables=[TableResult(*r) for r in tables], columns=[TableColumnResult(*r) for r in columns]
+    )
+
+
+def table_stmt(table: str, charset="utf8mb4", collation="utf8mb4_unicode_ci") -> str:
+    # return f"ALTER TABLE {table} CONVERT TO CHARACTER SET {charset} COLLATE {collation};"
+    return f"ALTER TABLE {table} DEFAULT CHARACTER SET {charset} DEFAULT COLLATE {collation};"
+
+
+def column_stmt(table: str, col: TableColumnResult, charset="utf8mb4", collation="utf8mb4_unicode_ci", column_type=None) -> str:
+    column_type = col.column_type if empty(column_type) else column_type
+    return f"ALTER TABLE {table} MODIFY {col.column} {column_type} " \
+           f"CHARACTER SET {charset} COLLATE {collation};"
+
+
+def get_create_table(table: str, database=None, conn: Connection = None) -> str:
+    """Returns the ``SHOW CREATE TABLE`` statement for ``table`` (optionally inside of ``database``)"""
+    name = f"`{database}`.`{table}`" if not empty(database) else f"`{table}`"
+    return query(f"SHOW CREATE TABLE {name};", one=True, use_tx=False, conn=conn)[1]
+
+
+def column_definitions(create_stmt: str) -> Dict[str, str]:
+    """
+    Extract each column's exact definition from a ``SHOW CREATE TABLE`` statement, returned as a dict
+    mapping column name -> definition, e.g. ``{'name': "`name` varchar(255) NOT NULL DEFAULT ''"}``
+    """
+    defs = {}
+    for line in create_stmt.splitlines()[1:]:
+        line = line.strip()
+        if not line.startswith('`'):
+            continue
+        end = line.index('`', 1)
+        while line[end:end + 2] == '``':
+            end = line.index('`', end + 2)
+        defs[line[1:end].replace('``', '`')] = line.rstrip(',')
+    return defs
+
+
+_CHARSET_RE = re.compile(r"\s+(CHARACTER SET|CHARSET|COLLATE)\s+\w+", re.IGNORECASE)
+
+
+def _split_definition(definition: str) -> Tuple[str, str]:
+    """Split a column definition into ``(name_and_type, attributes)``, respecting quotes inside ENUM/SET values"""
+    pos = definition.index('`', 1) + 1
+    while definition[pos:pos + 1] == '`':
+        pos = definition.index('`', pos + 1) + 1
+    m = re.compile(r"\s+\w+").match(definition, pos)
+    pos = m.end()
+    if definition[pos:pos + 1] == '(':
+        depth, quote = 0, None
+        while pos < len(definition):
+            ch = definition[pos]
+            if quote:
+                if ch == '\\':
+                    pos += 1
+                elif ch == quote:
+                    quote = None
+            elif ch in ["'", '"']:
+                quote = ch
+            elif ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+                if depth == 0:
+                    pos += 1
+                    break
+            pos += 1
+    return definition[:pos], definition[pos:]
+
+
+def retype_definition(definition: str, charset: str, collation: str) -> str:
+    """
+    Replace (or add) the ``CHARACTER SET`` / ``COLLATE`` of a column definition from ``SHOW CREATE TABLE``,
+    keeping everything else (``NOT NULL``, ``DEFAULT``, ``COMMENT`` etc.) exactly as it was.
+
+        >>> retype_definition("`name` varchar(64) COLLATE latin1_bin NOT NULL", 'utf8mb4', 'utf8mb4_bin')
+        '`name` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL'
+
+    """
+    head, attrs = _split_definition(definition)
+    # Only strip the charset/collation which come straight after the type, not text inside of a DEFAULT / COMMENT
+    while True:
+        m = _CHARSET_RE.match(attrs)
+        if m is None:
+            break
+        attrs = attrs[m.end():]
+    return f"{head} CHARACTER SET {charset} COLLATE {collation}{attrs}"
+
+
+def convert_table(table: str, charset="utf8mb4", collation="utf8mb4_unicode_ci", use_tx=True, conn: Connection = None,
+                  journal=None):
+    if journal is not None:
+        journal.record(table, 'table', table_stmt(table, charset=charset, collation=collation), conn=conn)
+    return query(table_stmt(table, charset=charset, collation=collation), use_tx=use_tx, conn=conn)
 
 
 def convert_tables(*tables: str, charset="utf8mb4", collation="utf8mb4_unicode_ci", use_tx=True):
     conn = connect()
-    if use_tx:
-        conn.begin()
+    if _use_tx(use_tx):
+        begin(conn)
     
     results = []
     
@@ -209,7 +534,7 @@ def convert_tables(*tables: str, charset="utf8mb4", collation="utf8mb4_unicode_c
                 log.error(
                     "Exception while bulk converting tables to %s, %s! Current table was: %s - Rolling back all changes to tables: %s",
                     charset, collation, tb, tables)
-                conn.rollback()
+                if _use_tx(use_tx): rollback(conn)
                 raise e
             log.warning("Exception while converting table %s to %s %s - ignoring error and moving on.", tb, charset, collation)
             results += [(tb, e)]
@@ -238,21 +563,50 @@ def convert_column(table: str, column: str, charset="utf8mb4", collation="utf8mb
     database = kwargs.pop('database', None)
     use_tx = kwargs.pop('use_tx', True)
     fail = kwargs.pop('fail', True)
+    journal = kwargs.pop('journal', None)
+    column_type = kwargs.pop('column_type', None)
+    # Pass an already fetched TableColumnResult as 'col' to save an INFORMATION_SCHEMA query per column
+    col = kwargs.pop('col', None)
     if not empty(database):
-        reconnect(database=database)
-    col = get_column(table, column, database=database, fail=fail)
-    
-    stmt = f"ALTER TABLE {table} MODIFY {col.column} {col.column_type} " \
-           f"CHARACTER SET {charset} COLLATE {collation};"
+        use_database(database)
+    if col is None:
+        col = get_column(table, column, database=database, fail=fail)
+    stmt = column_stmt(table, col, charset=charset, collation=collation, column_type=column_type)
+    if journal is not None:
+        journal.record(table, 'column', stmt, column=col.column, database=database)
     
     return query(stmt, one=True, use_tx=use_tx)
 
 
+def column_skip_reason(col: TableColumnResult, charset="utf8mb4", collation="utf8mb4_unicode_ci", columns=None,
+                       conv_all=False, skip_indexed=True) -> Optional[str]:
+    """
+    Returns a short human readable reason why the column ``col`` should NOT be converted to ``charset`` + ``collation``,
+    or ``None`` if the column should be converted.
+    """
+    columns = [] if empty(columns, itr=True) else list(columns)
+    if not conv_all and col.column not in columns:
+        return "not in columns arg"
+    if not empty(col.column_key) and skip_indexed:
+        return "column is an index"
+    if empty(col.character_set) and empty(col.collation):
+        return "column doesn't support char sets"
+    if str(col.character_set).lower() == charset.lower() and str(col.collation).lower() == collation.lower():
+        return f"column is already collation '{collation}' and charset '{charset}'"
+    return None
+
+
 def convert_columns(table: str, *columns, conv_all=False, charset="utf8mb4", collation="utf8mb4_unicode_ci", **kwargs):
     database = kwargs.pop('database', None)
     use_tx = kwargs.pop('use_tx', True)
     # fail = kwargs.pop('fail', True)
     skip_indexed = kwargs.pop('skip_indexed', True)
+    journal = kwargs.pop('journal', None)
+    # Optional results from colfixer.prescan.prescan() - dict of (table, column) -> ColumnStats
+    prescan = kwargs.pop('prescan', None)
+    prescan = {} if empty(prescan) else prescan
+    # Optional list of TableColumnResult's for this table, e.g. from fetch_catalog(), to avoid re-fetching them
+    cols = kwargs.pop('cols', None)
     columns = list(columns)
     
     if all([empty(database), empty(settings.DB_NAME)]):
@@ -262,43 +616,50 @@ def convert_columns(table: str, *columns, conv_all=False, charset="utf8mb4", col
         raise AttributeError("No columns specified in args, and conv_fall is False - cannot continue!")
 
     # lencols = len(columns)
-    cols = get_columns(database, table)
+    if cols is None:
+        cols = get_columns(database, table)
     
     conn = connect()
     if not empty(database):
-        conn = reconnect(database=database)
-    if use_tx:
-        conn.begin()
+        conn = use_database(database)
+    if _use_tx(use_tx):
+        begin(conn)
     results = []
     
     for c in cols:
         try:
-            if not conv_all and c.column not in columns:
-                log.info("Skipping column '%s' on table '%s' - not in columns arg.", c.column, table)
+            reason = column_skip_reason(
+                c, charset=charset, collation=collation, columns=columns, conv_all=conv_all, skip_indexed=skip_indexed
+            )
+            if reason is not None:
+                log.info("Skipping column '%s' on table '%s' - %s", c.column, table, reason)
                 continue
-            if not empty(c.column_key) and skip_indexed:
-                log.info("Skipping column '%s' on table '%s' - column is an index!", c.column, table)
-                continue
-            if empty(c.character_set) and empty(c.collation):
-                log.info("Skipping column '%s' on table '%s' - column doesn't support char sets!", c.column, table)
-                continue
-            if c.character_set.lower() == charset.lower() and c.collation.lower() == collation.lower():
-                log.info("Skipping column '%s' on table '%s' - column is already collation '%s' and charset '%s'",
-                         c.column, table, collation, charset)
+            stats, column_type = prescan.get((table, c.column)), None
+            if stats is not None and stats.action == 'skip':
+                log.warning("Skipping column '%s' on table '%s' - prescan: %s", c.column, table, stats.reason)
                 continue
+            if stats is not None and stats.action == 'warn':
+                log.warning("Converting column '%s' on table '%s' despite prescan warning: %s", c.column, table, stats.reason)
+            if stats is not None and stats.action == 'promote':
+                log.warning("Promoting column '%s' on table '%s' to %s - prescan: %s", c.column, table, stats.promote_to, stats.reason)
+                column_type = stats.promote_to
             log.info("Converting column '%s' on table '%s' to charset %s and collation %s", c.column, table, charset, collation)
-            convert_column(table, c.column, charset=charset, collation=collation, fail=False, use_tx=not use_tx)
+            convert_column(
+                table, c.column, charset=charset, collation=collation, fail=False, use_tx=not use_tx, journal=journal,
+                column_type=column_type, col=c
+            )
             results += [(c, True)]
         except Exception as e:
             if use_tx:
                 log.error(
                     "Exception while bulk converting cols to %s, %s! Current col was: %s.%s - Rolling back all changes to columns: %s",
                     charset, collation, table, c.column, columns)
-                conn.rollback()
+                if _use_tx(use_tx): rollback(conn)
                 raise e
             log.warning("Exception while converting column %s to %s %s - ignoring error and moving on.", c.column, charset, collation)
             results += [(c, e)]
     
-    conn.commit()
+    if not settings.REMOTE:
+        commit(conn)
     
     return results
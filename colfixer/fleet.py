@@ -0,0 +1,210 @@
+"""
+Fleet mode - plan a conversion once against a reference server, then run that plan against many servers
+(e.g. shards with identical schemas) in parallel, with a connection pool per host.
+
+Example inventory (YAML / TOML / JSON)::
+
+    reference: shard01
+    defaults:
+      database: my_app
+      user_env: FLEET_DB_USER
+      password_env: FLEET_DB_PASS
+      concurrency: 2
+    hosts:
+      shard01:
+        host: 10.0.0.11
+      shard02:
+        host: 10.0.0.12
+        port: 3307
+        concurrency: 4
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from os import getenv as env
+from typing import Any, Dict, List, Optional
+
+from privex.helpers import empty
+
+from colfixer import core, settings
+from colfixer.helpers import load_config_file
+from colfixer.journal import Journal
+from colfixer.plan import Plan, TablePlan, TableStatus, build_plan, run_table
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class FleetHost:
+    name: str
+    host: str
+    port: int = 3306
+    user: Optional[str] = None
+    password: Optional[str] = None
+    database: Optional[str] = None
+    concurrency: int = 1
+
+    @property
+    def conn_args(self) -> Dict[str, Any]:
+        return dict(host=self.host, port=self.port, user=self.user, password=self.password, database=self.database)
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any], defaults: Dict[str, Any] = None) -> 'FleetHost':
+        """
+        Build a :class:`.FleetHost` from an inventory entry merged over ``defaults``.
+
+        Credentials can be read from the environment using ``user_env`` / ``password_env``, which contain the NAME
+        of the env var to load - an error is raised if that env var isn't set. If neither a literal nor an env var is
+        given, ``settings.DB_USER`` / ``DB_PASS`` are used.
+        """
+        d = {**(defaults or {}), **(data or {})}
+        host_name = str(d.get('name', name))
+        creds = {}
+        for key in ['user', 'password']:
+            var = d.get(f'{key}_env')
+            if empty(var):
+                creds[key] = d.get(key)
+                continue
+            creds[key] = env(var)
+            if creds[key] is None:
+                # Never fall back to the default credentials because of a typo in the inventory
+                raise AttributeError(f"Inventory host '{host_name}' has {key}_env: {var} - but env var '{var}' is not set")
+        user, password = creds['user'], creds['password']
+        return cls(
+            name=host_name,
+            host=d.get('host', name),
+            port=int(d.get('port', settings.DB_PORT)),
+            user=settings.DB_USER if empty(user) else user,
+            password=settings.DB_PASS if password is None else password,
+            database=d.get('database', settings.DB_NAME),
+            concurrency=max(1, int(d.get('concurrency', 1))),
+        )
+
+
+@dataclass
+class Inventory:
+    hosts: List[FleetHost] = field(default_factory=list)
+    reference: Optional[str] = None
+
+    @property
+    def reference_host(self) -> FleetHost:
+        """The host to plan against - ``reference`` from the inventory, otherwise the first host"""
+        if empty(self.reference):
+            return self.hosts[0]
+        return self.get(self.reference)
+
+    @property
+    def names(self) -> List[str]:
+        return [h.name for h in self.hosts]
+
+    def get(self, name: str) -> FleetHost:
+        for h in self.hosts:
+            if h.name == name:
+                return h
+        raise KeyError(f"Host '{name}' is not in the inventory")
+
+
+def local_inventory(concurrency: int = 1) -> Inventory:
+    """An :class:`.Inventory` containing just the server configured in :mod:`colfixer.settings`"""
+    return Inventory(hosts=[FleetHost(
+        name=settings.DB_HOST, host=settings.DB_HOST, port=settings.DB_PORT, user=settings.DB_USER,
+        password=settings.DB_PASS, database=settings.DB_NAME, concurrency=max(1, int(concurrency))
+    )])
+
+
+def load_inventory(filename: str) -> Inventory:
+    data = load_config_file(filename)
+    defaults = data.get('defaults', {})
+    hosts = data.get('hosts', {})
+    if isinstance(hosts, dict):
+        hosts = [FleetHost.from_dict(name, h, defaults) for name, h in hosts.items()]
+    else:
+        hosts = [FleetHost.from_dict(h.get('name', h.get('host')), h, defaults) for h in hosts]
+    if empty(hosts, itr=True):
+        raise AttributeError(f"No hosts found in inventory file '{filename}'")
+    no_db = [h.name for h in hosts if empty(h.database)]
+    if len(no_db) > 0:
+        # Without a database, build_plan would plan against EVERY schema (mysql, sys ...) using bare table names
+        raise AttributeError(
+            f"Inventory hosts {', '.join(no_db)} have no 'database' (and no DB_NAME is configured) - cannot continue!"
+        )
+    inv = Inventory(hosts=hosts, reference=data.get('reference'))
+    log.debug("Loaded inventory with %d hosts, reference host: %s", len(hosts), inv.reference_host.name)
+    return inv
+
+
+def plan_fleet(inventory: Inventory, **kwargs) -> Plan:
+    """
+    Build a :class:`.Plan` against the inventory's reference host - ``kwargs`` are passed to :func:`.build_plan`.
+    """
+    ref = inventory.reference_host
+    log.info("Planning conversion against reference host %s (%s:%s)", ref.name, ref.host, ref.port)
+    pool = core.ConnectionPool(1, **ref.conn_args)
+    try:
+        with pool.acquire() as conn:
+            return build_plan(ref.database, conn=conn, **kwargs)
+    finally:
+        pool.close()
+
+
+def _run_on_host(host: FleetHost, pool: core.ConnectionPool, tp: TablePlan, journal: Journal = None) -> TableStatus:
+    try:
+        with pool.acquire() as conn:
+            return run_table(tp, conn, host=host.name, journal=journal)
+    except Exception as e:
+        log.warning("[%s] Could not run plan for table %s - %s - %s", host.name, tp.table, type(e), str(e))
+        return TableStatus(table=tp.table, host=host.name, status='failed', total=len(tp.steps), error=str(e))
+
+
+def run_plan(inventory: Inventory, plan: Plan, hosts: List[str] = None, run_id: str = None) -> List[TableStatus]:
+    """
+    Run ``plan`` on every host in ``inventory`` (or just the host names in ``hosts``) in parallel.
+
+    Each host gets its own :class:`.ConnectionPool` and thread pool, sized by the host's ``concurrency``, so that at
+    most ``concurrency`` tables are being altered on any one server at a time.
+
+    If ``run_id`` is set, every change is recorded in the journal for that run, so it can be reverted later.
+    """
+    targets = inventory.hosts if empty(hosts, itr=True) else [inventory.get(h) for h in hosts]
+    return run_plans(inventory, {h.name: plan for h in targets}, run_id=run_id)
+
+
+def run_plans(inventory: Inventory, plans: Dict[str, Plan], run_id: str = None) -> List[TableStatus]:
+    """Same as :func:`.run_plan`, but with a different :class:`.Plan` per host name"""
+    pools, executors, futures = [], [], []
+    try:
+        for name, plan in plans.items():
+            h = inventory.get(name)
+            pool = core.ConnectionPool(h.concurrency, **h.conn_args)
+            ex = ThreadPoolExecutor(max_workers=h.concurrency, thread_name_prefix=f"fleet-{h.name}")
+            pools.append(pool)
+            executors.append(ex)
+            journal = None if empty(run_id) else Journal(run_id, host=h.name, database=h.database)
+            futures += [ex.submit(_run_on_host, h, pool, tp, journal) for tp in plan.tables]
+        return [f.result() for f in futures]
+    finally:
+        for ex in executors:
+            ex.shutdown(wait=True)
+        for pool in pools:
+            pool.close()
@@ -0,0 +1,65 @@
+"""
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import json
+from os import path
+from typing import Any, Dict
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    import tomllib as toml
+except ImportError:
+    try:
+        import toml
+    except ImportError:
+        toml = None
+
+
+def load_config_file(filename: str) -> Dict[str, Any]:
+    """
+    Load a YAML (``.yml`` / ``.yaml``), TOML (``.toml``) or JSON (``.json``) file into a dictionary.
+
+    YAML requires the ``pyyaml`` package, and TOML requires either Python 3.11+ or the ``toml`` package. Since JSON
+    is valid YAML, ``.json`` files (and files with unknown extensions) are always loadable.
+    """
+    ext = path.splitext(str(filename))[1].lower()
+    if ext == '.toml':
+        if toml is None:
+            raise ImportError(f"Cannot load '{filename}' - please install the 'toml' package, or use Python 3.11+")
+        with open(filename, 'rb' if toml.__name__ == 'tomllib' else 'r') as fh:
+            return toml.load(fh)
+
+    with open(filename, 'r') as fh:
+        if ext in ['.yml', '.yaml']:
+            if yaml is None:
+                raise ImportError(f"Cannot load '{filename}' - please install the 'pyyaml' package")
+            data = yaml.safe_load(fh)
+        elif yaml is not None:
+            data = yaml.safe_load(fh)
+        else:
+            data = json.load(fh)
+    return {} if data is None else data
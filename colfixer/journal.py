@@ -0,0 +1,274 @@
+"""
+Reversal journal - before each ALTER, the original ``SHOW CREATE TABLE`` and column definitions are saved into a
+local JSON lines file (one file per run), which can later be used to build the reverse ALTERs.
+
+MySQL/MariaDB commit DDL implicitly, so ``conn.rollback()`` can't undo a table/column conversion - the journal can.
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from MySQLdb.connections import Connection
+from privex.helpers import empty
+
+from colfixer import core, settings
+from colfixer.plan import Plan, PlanStep, TablePlan
+
+log = logging.getLogger(__name__)
+
+_FILE_LOCKS: Dict[str, threading.Lock] = {}
+_FILE_LOCKS_LOCK = threading.Lock()
+
+
+def _file_lock(filename: str) -> threading.Lock:
+    with _FILE_LOCKS_LOCK:
+        if filename not in _FILE_LOCKS:
+            _FILE_LOCKS[filename] = threading.Lock()
+        return _FILE_LOCKS[filename]
+
+
+@dataclass
+class ColumnSnapshot:
+    definition: str
+    """The column's exact definition from ``SHOW CREATE TABLE``"""
+    character_set: Optional[str] = None
+    collation: Optional[str] = None
+
+
+@dataclass
+class TableSnapshot:
+    run_id: str
+    host: str
+    database: str
+    table: str
+    create_table: str
+    character_set: Optional[str] = None
+    collation: Optional[str] = None
+    columns: Dict[str, ColumnSnapshot] = field(default_factory=dict)
+    time: float = field(default_factory=time.time)
+    type: str = 'snapshot'
+
+
+@dataclass
+class JournalChange:
+    run_id: str
+    host: str
+    database: str
+    table: str
+    kind: str
+    """Either ``table`` (table default charset / collation) or ``column``"""
+    statement: str
+    column: Optional[str] = None
+    time: float = field(default_factory=time.time)
+    type: str = 'change'
+
+
+def new_run_id() -> str:
+    return datetime.utcnow().strftime('%Y%m%d-%H%M%S') + '-' + uuid4().hex[:6]
+
+
+class Journal:
+    """
+    Records the original state of each table before it's altered. One :class:`.Journal` should be used per server,
+    but several journals (e.g. one per fleet host) can share the same ``run_id`` - and therefore the same file.
+
+    The change entry is written BEFORE the ALTER is executed, so a crash mid-ALTER still leaves a revertable entry
+    (reverting a column which was never changed just re-applies its original definition).
+    """
+    def __init__(self, run_id: str = None, host: str = None, database: str = None, directory: str = None):
+        self.run_id = new_run_id() if empty(run_id) else run_id
+        self.host = settings.DB_HOST if empty(host) else host
+        self.database = database
+        self.directory = settings.JOURNAL_DIR if empty(directory) else directory
+        self._snapshotted = set()
+        self._lock = threading.Lock()
+
+    @property
+    def filename(self) -> str:
+        return os.path.join(self.directory, f"{self.run_id}.jsonl")
+
+    def _write(self, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        with _file_lock(self.filename):
+            with open(self.filename, 'a') as fh:
+                fh.write(json.dumps(asdict(entry)) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    def _database(self, database=None, conn: Connection = None) -> str:
+        if not empty(database):
+            return database
+        if not empty(self.database):
+            return self.database
+        return core.query("SELECT DATABASE();", one=True, use_tx=False, conn=conn)[0]
+
+    def capture(self, table: str, database=None, conn: Connection = None) -> Optional[TableSnapshot]:
+        """Save a snapshot of ``table``, unless it was already captured during this run"""
+        database = self._database(database, conn=conn)
+        with self._lock:
+            if (database, table) in self._snapshotted:
+                return None
+            self._snapshotted.add((database, table))
+        try:
+            # Independent metadata queries - pipelined into one round trip in remote mode
+            create, tbl, cols = core.query_many(
+                (f"SHOW CREATE TABLE `{database}`.`{table}`;", []),
+                core._tables_query(database, table),
+                core._columns_query(database, table),
+                conn=conn
+            )
+            create = create[0][1]
+            tbl = [core.TableResult(*r) for r in tbl]
+            cols = {c.column: c for c in (core.TableColumnResult(*r) for r in cols)}
+        except Exception:
+            with self._lock:
+                self._snapshotted.discard((database, table))
+            raise
+        snap = TableSnapshot(
+            run_id=self.run_id, host=self.host, database=database, table=table, create_table=create,
+            character_set=tbl[0].character_set if len(tbl) > 0 else None, collation=tbl[0].collation if len(tbl) > 0 else None,
+        )
+        for name, definition in core.column_definitions(create).items():
+            c = cols.get(name)
+            snap.columns[name] = ColumnSnapshot(
+                definition, character_set=None if c is None else c.character_set, collation=None if c is None else c.collation
+            )
+        self._write(snap)
+        return snap
+
+    def record(self, table: str, kind: str, statement: str, column: str = None, database=None, conn: Connection = None):
+        """Capture ``table`` (if needed) and then record that ``statement`` is about to be run against it"""
+        database = self._database(database, conn=conn)
+        self.capture(table, database=database, conn=conn)
+        self._write(JournalChange(
+            run_id=self.run_id, host=self.host, database=database, table=table, kind=kind, statement=statement, column=column
+        ))
+
+
+def load_entries(run_id: str, directory: str = None) -> Tuple[List[TableSnapshot], List[JournalChange]]:
+    directory = settings.JOURNAL_DIR if empty(directory) else directory
+    snapshots, changes = [], []
+    with open(os.path.join(directory, f"{run_id}.jsonl"), 'r') as fh:
+        for line in fh:
+            line = line.strip()
+            if empty(line):
+                continue
+            d = json.loads(line)
+            if d.get('type') == 'snapshot':
+                d['columns'] = {k: ColumnSnapshot(**v) for k, v in d.get('columns', {}).items()}
+                snapshots.append(TableSnapshot(**d))
+            else:
+                changes.append(JournalChange(**d))
+    return snapshots, changes
+
+
+def list_runs(directory: str = None) -> List[Tuple[str, datetime, int]]:
+    """Returns ``(run_id, last_modified, entry_count)`` for each journal, newest first"""
+    directory = settings.JOURNAL_DIR if empty(directory) else directory
+    if not os.path.isdir(directory):
+        return []
+    runs = []
+    for f in os.listdir(directory):
+        if not f.endswith('.jsonl'):
+            continue
+        fpath = os.path.join(directory, f)
+        with open(fpath, 'r') as fh:
+            count = sum(1 for line in fh if line.strip())
+        runs.append((f[:-len('.jsonl')], datetime.fromtimestamp(os.path.getmtime(fpath)), count))
+    return sorted(runs, key=lambda r: r[1], reverse=True)
+
+
+def revert_stmt(snap: TableSnapshot, changes: List[JournalChange]) -> Optional[str]:
+    """
+    Build ONE ``ALTER TABLE`` which undoes every change in ``changes`` (which must all be for ``snap``'s table).
+
+    Columns are restored to their exact original definition with an explicit charset + collation, since
+    ``SHOW CREATE TABLE`` omits them when they match the (possibly since changed) table default.
+    """
+    clauses, seen = [], set()
+    for ch in changes:
+        if ch.kind == 'column':
+            if ch.column in seen:
+                continue
+            seen.add(ch.column)
+            col = snap.columns.get(ch.column)
+            if col is None:
+                log.warning("Cannot revert column %s.%s - no original definition in journal", snap.table, ch.column)
+                continue
+            defn = col.definition
+            if not empty(col.character_set) and not empty(col.collation):
+                defn = core.retype_definition(defn, col.character_set, col.collation)
+            clauses.append(f"MODIFY {defn}")
+        elif ch.kind == 'table' and 'table' not in seen:
+            seen.add('table')
+            if empty(snap.character_set) or empty(snap.collation):
+                log.warning("Cannot revert default charset of table %s - not found in journal", snap.table)
+                continue
+            clauses.append(f"DEFAULT CHARACTER SET {snap.character_set} DEFAULT COLLATE {snap.collation}")
+    if len(clauses) == 0:
+        return None
+    return f"ALTER TABLE `{snap.database}`.`{snap.table}` " + ', '.join(clauses) + ';'
+
+
+def build_reverts(run_id: str, tables: List[str] = None, columns: List[str] = None,
+                  directory: str = None) -> Dict[str, Plan]:
+    """
+    Build a revert :class:`.Plan` per host for the journal ``run_id``, with one batched statement per table.
+
+    Pass ``tables`` and/or ``columns`` to only undo part of a run (when ``columns`` is given, table default
+    changes are not reverted).
+    """
+    snapshots, changes = load_entries(run_id, directory=directory)
+    # The FIRST snapshot of a table in a run holds its original state.
+    snaps: Dict[Tuple[str, str, str], TableSnapshot] = {}
+    for s in snapshots:
+        snaps.setdefault((s.host, s.database, s.table), s)
+
+    grouped: Dict[Tuple[str, str, str], List[JournalChange]] = {}
+    for ch in changes:
+        if not empty(tables, itr=True) and ch.table not in tables:
+            continue
+        if not empty(columns, itr=True) and (ch.kind != 'column' or ch.column not in columns):
+            continue
+        grouped.setdefault((ch.host, ch.database, ch.table), []).append(ch)
+
+    plans: Dict[str, Plan] = {}
+    for key, chs in grouped.items():
+        host, database, table = key
+        snap = snaps.get(key)
+        if snap is None:
+            log.warning("Cannot revert table %s.%s on %s - no snapshot in journal", database, table, host)
+            continue
+        stmt = revert_stmt(snap, chs)
+        if stmt is None:
+            continue
+        plan = plans.setdefault(host, Plan(database=None, charset='', collation=''))
+        plan.tables.append(TablePlan(table=f"{database}.{table}", steps=[PlanStep('revert', stmt)]))
+    return plans
@@ -0,0 +1,196 @@
+"""
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from MySQLdb.connections import Connection
+from privex.helpers import empty
+
+from colfixer import core
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PlanStep:
+    kind: str
+    """
+    Either ``table`` (changing the table's default charset / collation), ``column``, or ``alter`` (one combined
+    ALTER changing the table default if ``table_default`` is true, plus every column in ``columns``)
+    """
+    statement: str
+    column: Optional[str] = None
+    columns: List[str] = field(default_factory=list)
+    table_default: bool = False
+
+    @property
+    def changes(self) -> List[Tuple[str, Optional[str]]]:
+        """The ``(kind, column)`` pairs changed by this step, as recorded in the journal"""
+        if self.kind in ['table', 'column']:
+            return [(self.kind, self.column)]
+        if self.kind == 'alter':
+            return ([('table', None)] if self.table_default else []) + [('column', c) for c in self.columns]
+        return []
+
+
+@dataclass
+class SkippedColumn:
+    column: str
+    reason: str
+
+
+@dataclass
+class TablePlan:
+    table: str
+    schema: Optional[str] = None
+    steps: List[PlanStep] = field(default_factory=list)
+    skipped: List[SkippedColumn] = field(default_factory=list)
+
+    @property
+    def columns(self) -> List[str]:
+        return [s.column for s in self.steps if s.kind == 'column']
+
+
+@dataclass
+class Plan:
+    database: Optional[str]
+    charset: str
+    collation: str
+    tables: List[TablePlan] = field(default_factory=list)
+
+    @property
+    def total_steps(self) -> int:
+        return sum(len(t.steps) for t in self.tables)
+
+
+@dataclass
+class TableStatus:
+    table: str
+    host: Optional[str] = None
+    status: str = 'pending'
+    """One of ``pending``, ``ok``, ``failed``, ``cancelled`` or ``noop`` (nothing to do)"""
+    done: int = 0
+    total: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    round_trips: int = 0
+
+
+def build_plan(database=None, tables: List[str] = None, conv_tables=True, conv_columns=False, columns: List[str] = None,
+               charset="utf8mb4", collation="utf8mb4_unicode_ci", skip_indexed=True, conn: Connection = None,
+               prescan: dict = None) -> Plan:
+    """
+    Scan the catalog ONCE (one query for tables, and one for columns if ``conv_columns`` is true), and return a
+    :class:`.Plan` containing every ALTER statement needed to convert ``tables`` (or all tables if empty).
+
+    The plan only contains table names - not schema names - so it can be replayed on any server with an
+    identical schema, e.g. every shard in a fleet.
+
+    If ``prescan`` results from :func:`colfixer.prescan.prescan` are passed, columns are skipped or promoted to a
+    larger type based on each column's prescan ``action``.
+    """
+    columns = [] if empty(columns, itr=True) else list(columns)
+    prescan = {} if empty(prescan) else prescan
+    all_tables = core.get_tables(database, conn=conn)
+    if empty(tables, itr=True):
+        selected = all_tables
+    else:
+        by_name = {t.table: t for t in all_tables}
+        missing = [t for t in tables if t not in by_name]
+        if len(missing) > 0:
+            raise core.TableNotFound(f"Tables not found in database '{database}': {', '.join(missing)}")
+        selected = [by_name[t] for t in tables]
+
+    table_cols: Dict[str, List[core.TableColumnResult]] = {}
+    if conv_columns:
+        for c in core.get_columns(database, conn=conn):
+            table_cols.setdefault(c.table, []).append(c)
+
+    plan = Plan(database=database, charset=charset, collation=collation)
+    for t in selected:
+        tp = TablePlan(table=t.table)
+        if conv_tables:
+            tp.steps.append(PlanStep('table', core.table_stmt(t.table, charset=charset, collation=collation)))
+        for c in table_cols.get(t.table, []):
+            reason = core.column_skip_reason(
+                c, charset=charset, collation=collation, columns=columns, conv_all=empty(columns, itr=True),
+                skip_indexed=skip_indexed
+            )
+            stats, column_type = prescan.get((t.table, c.column)), None
+            if reason is None and stats is not None and stats.action == 'skip':
+                reason = f"prescan: {stats.reason}"
+            if reason is not None:
+                tp.skipped.append(SkippedColumn(c.column, reason))
+                continue
+            if stats is not None and stats.action in ['warn', 'promote']:
+                log.warning("Column '%s' on table '%s' - prescan: %s", c.column, t.table, stats.reason)
+                column_type = stats.promote_to
+            stmt = core.column_stmt(t.table, c, charset=charset, collation=collation, column_type=column_type)
+            tp.steps.append(PlanStep('column', stmt, c.column))
+        plan.tables.append(tp)
+    return plan
+
+
+def run_table(tp: TablePlan, conn: Connection, host: str = None, journal=None, on_statement: Callable = None,
+              cancelled: threading.Event = None) -> TableStatus:
+    """
+    Execute every step of a :class:`.TablePlan` in order using ``conn``, stopping at the first failed statement.
+
+    DDL is implicitly committed by MySQL/MariaDB, so statements are sent without a BEGIN/COMMIT around them. If a
+    :class:`colfixer.journal.Journal` is passed, each table / column change is journaled before it's executed.
+
+    :param on_statement: Called as ``on_statement(step, elapsed)`` after each statement completes
+    :param cancelled: If this event is set, no further statements are started, and the status is ``cancelled``
+    """
+    status = TableStatus(table=tp.table, host=host, total=len(tp.steps))
+    if status.total == 0:
+        status.status = 'noop'
+        return status
+    start, start_rtt = time.time(), core.round_trips()
+    try:
+        for step in tp.steps:
+            if cancelled is not None and cancelled.is_set():
+                log.info("[%s] Cancelled - not running remaining statements for table %s", host, tp.table)
+                status.status = 'cancelled'
+                break
+            log.info("[%s] Executing on table %s: %s", host, tp.table, step.statement)
+            if journal is not None:
+                for kind, column in step.changes:
+                    journal.record(tp.table, kind, step.statement, column=column, database=tp.schema, conn=conn)
+            st_start = time.time()
+            core.query(step.statement, use_tx=False, conn=conn)
+            status.done += 1
+            if on_statement is not None:
+                on_statement(step, time.time() - st_start)
+        else:
+            status.status = 'ok'
+    except Exception as e:
+        log.warning("[%s] Error while converting table %s - %s - %s", host, tp.table, type(e), str(e))
+        status.status, status.error = 'failed', str(e)
+    status.elapsed = time.time() - start
+    status.round_trips = core.round_trips() - start_rtt
+    return status
@@ -0,0 +1,237 @@
+"""
+Data-content prescan - scan the actual data of each column before converting it, to find columns which are pure
+ASCII (cheap + safe), would grow past their type's byte limit, or contain characters which can't be represented
+in the target character set.
+
+Tables with a single numeric primary key are scanned in chunks of ``chunk_size`` rows, spread over a connection
+pool. Chunk boundaries are found by walking the primary key index (keyset pagination), so sparse keys - e.g.
+snowflake / hash style IDs - don't create any empty chunks. Other tables are scanned with a single query.
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from privex.helpers import empty
+
+from colfixer import core
+
+log = logging.getLogger(__name__)
+
+TEXT_LIMITS = {'tinytext': 255, 'text': 65535, 'mediumtext': 16777215, 'longtext': 4294967295}
+"""Maximum size in BYTES of each TEXT type"""
+
+PROMOTIONS = {'tinytext': 'text', 'text': 'mediumtext', 'mediumtext': 'longtext'}
+
+NUMERIC_TYPES = ['tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint']
+
+ON_LOSSY = ['skip', 'warn']
+ON_OVERFLOW = ['promote', 'skip', 'warn']
+
+
+@dataclass
+class ColumnStats:
+    schema: str
+    table: str
+    column: str
+    data_type: str
+    character_set: str
+    rows: int = 0
+    max_length: int = 0
+    """Largest value in BYTES, in the column's current charset"""
+    max_char_length: int = 0
+    max_target_length: int = 0
+    """Largest value in BYTES after converting to the target charset"""
+    non_ascii: int = 0
+    """Number of values containing at least one non-ASCII byte"""
+    lossy: int = 0
+    """Number of values which don't survive a round trip through the target charset"""
+    verdict: str = 'pending'
+    """One of ``empty``, ``ascii``, ``ok``, ``overflow`` or ``lossy``"""
+    action: str = 'convert'
+    """One of ``convert``, ``skip``, ``warn`` or ``promote``"""
+    promote_to: Optional[str] = None
+    reason: str = ''
+
+    def merge(self, rows, max_length, max_char_length, max_target_length, non_ascii, lossy):
+        self.rows += int(rows or 0)
+        self.max_length = max(self.max_length, int(max_length or 0))
+        self.max_char_length = max(self.max_char_length, int(max_char_length or 0))
+        self.max_target_length = max(self.max_target_length, int(max_target_length or 0))
+        self.non_ascii += int(non_ascii or 0)
+        self.lossy += int(lossy or 0)
+
+
+def classify(stats: ColumnStats, charset: str, on_lossy='skip', on_overflow='promote') -> ColumnStats:
+    """Set the ``verdict``, ``action``, ``promote_to`` and ``reason`` of ``stats`` based on the scanned data"""
+    dtype = stats.data_type.lower()
+    limit = TEXT_LIMITS.get(dtype)
+    if stats.lossy > 0:
+        stats.verdict, stats.action = 'lossy', on_lossy
+        stats.reason = f"{stats.lossy} values contain characters which cannot be represented in {charset}"
+    elif limit is not None and stats.max_target_length > limit:
+        stats.verdict, stats.action = 'overflow', on_overflow
+        stats.reason = f"largest value would be {stats.max_target_length} bytes in {charset}, " \
+                       f"but {dtype.upper()} can only hold {limit} bytes"
+        if stats.action == 'promote':
+            stats.promote_to = PROMOTIONS.get(dtype)
+            if stats.promote_to is None:
+                stats.action = 'skip'
+            else:
+                stats.reason += f" - promoting to {stats.promote_to.upper()}"
+    elif stats.rows == 0:
+        stats.verdict, stats.action, stats.reason = 'empty', 'convert', 'no rows'
+    elif stats.non_ascii == 0:
+        stats.verdict, stats.action, stats.reason = 'ascii', 'convert', 'all values are pure ASCII'
+    else:
+        stats.verdict, stats.action, stats.reason = 'ok', 'convert', f"{stats.non_ascii} values contain non-ASCII data"
+    return stats
+
+
+def _aggregates(col: core.TableColumnResult, charset: str) -> List[str]:
+    c = f"`{col.column}`"
+    # Non-ASCII characters become '?' when converted to ascii, so any value containing one no longer matches
+    return [
+        f"MAX(LENGTH({c}))",
+        f"MAX(CHAR_LENGTH({c}))",
+        f"MAX(LENGTH(CONVERT({c} USING {charset})))",
+        f"SUM(CAST({c} AS BINARY) <> CAST(CONVERT({c} USING ascii) AS BINARY))",
+        f"SUM(CAST(CONVERT(CONVERT({c} USING {charset}) USING {col.character_set}) AS BINARY) <> CAST({c} AS BINARY))",
+    ]
+
+
+def _scan_chunk(pool: core.ConnectionPool, database: str, table: str, cols: List[core.TableColumnResult],
+                charset: str, pk: str = None, after=None, end=None) -> List[Tuple]:
+    """Scan the rows with ``after < pk <= end`` (either bound can be ``None``), or the whole table if ``pk`` is ``None``"""
+    aggs = [a for c in cols for a in _aggregates(c, charset)]
+    stmt = f"SELECT COUNT(*), {', '.join(aggs)} FROM `{database}`.`{table}`"
+    where, params = [], []
+    if pk is not None and after is not None:
+        where.append(f"`{pk}` > %s")
+        params.append(after)
+    if pk is not None and end is not None:
+        where.append(f"`{pk}` <= %s")
+        params.append(end)
+    if len(where) > 0:
+        stmt += " WHERE " + ' AND '.join(where)
+    with pool.acquire() as conn:
+        row = core.query(stmt + ';', *params, one=True, use_tx=False, conn=conn)
+    # Split the single result row back into one tuple of stats per column
+    return [(row[0], *row[1 + i * 5:6 + i * 5]) for i in range(len(cols))]
+
+
+def _next_boundary(pool: core.ConnectionPool, database: str, table: str, pk: str, after, chunk_size: int):
+    """
+    Returns the primary key of the ``chunk_size``'th row after ``after`` (from the start of the table if ``None``),
+    or ``None`` if there are fewer rows than that left - only the primary key index is read.
+    """
+    stmt = f"SELECT `{pk}` FROM `{database}`.`{table}`"
+    params = []
+    if after is not None:
+        stmt += f" WHERE `{pk}` > %s"
+        params.append(after)
+    stmt += f" ORDER BY `{pk}` LIMIT 1 OFFSET {int(chunk_size) - 1};"
+    with pool.acquire() as conn:
+        row = core.query(stmt, *params, one=True, use_tx=False, conn=conn)
+    return None if row is None else row[0]
+
+
+def prescan(database: str, tables: List[str] = None, columns: List[str] = None, charset="utf8mb4",
+            collation="utf8mb4_unicode_ci", skip_indexed=True, workers=4, chunk_size=100000, on_lossy='skip',
+            on_overflow='promote', **conn_override) -> Dict[Tuple[str, str], ColumnStats]:
+    """
+    Scan the data in every column of ``tables`` (all tables if empty) which would be converted to ``charset`` +
+    ``collation``, and return a :class:`.ColumnStats` per ``(table, column)``.
+
+    The result can be passed as ``prescan=`` to :func:`colfixer.core.convert_columns` or
+    :func:`colfixer.plan.build_plan`, which will then skip, warn about, or promote each column based on its ``action``.
+
+    ``conn_override`` is passed to the :class:`colfixer.core.ConnectionPool` (up to ``workers`` connections).
+    """
+    if empty(database):
+        # Without a database, get_columns() would return every schema (mysql, sys ...) keyed by bare table name
+        raise AttributeError("No database specified to prescan - cannot continue!")
+    if int(chunk_size) < 1:
+        raise AttributeError(f"chunk_size must be at least 1 (got {chunk_size})")
+    pool = core.ConnectionPool(workers, database=database, **conn_override)
+    try:
+        with pool.acquire() as conn:
+            all_cols = core.get_columns(database, conn=conn)
+        by_table: Dict[str, List[core.TableColumnResult]] = {}
+        for c in all_cols:
+            if empty(tables, itr=True) or c.table in tables:
+                by_table.setdefault(c.table, []).append(c)
+
+        results: Dict[Tuple[str, str], ColumnStats] = {}
+        targets: Dict[str, List[core.TableColumnResult]] = {}
+        pks: Dict[str, Optional[str]] = {}
+        for table, cols in by_table.items():
+            for c in cols:
+                reason = core.column_skip_reason(
+                    c, charset=charset, collation=collation, columns=columns, conv_all=empty(columns, itr=True),
+                    skip_indexed=skip_indexed
+                )
+                if reason is None:
+                    targets.setdefault(table, []).append(c)
+                    results[(table, c.column)] = ColumnStats(
+                        schema=c.schema, table=table, column=c.column, data_type=c.data_type, character_set=c.character_set
+                    )
+            pri = [c for c in cols if c.column_key == 'PRI']
+            pks[table] = pri[0].column if len(pri) == 1 and pri[0].data_type.lower() in NUMERIC_TYPES else None
+
+        # Only a few chunks are queued ahead of the workers, rather than every chunk of every table up front
+        pending, max_pending = deque(), max(1, int(workers)) * 2
+
+        def _collect(limit: int):
+            while len(pending) > limit:
+                table, cols, f = pending.popleft()
+                for c, stats in zip(cols, f.result()):
+                    results[(table, c.column)].merge(*stats)
+
+        with ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='colfixer-prescan') as ex:
+            for table, cols in targets.items():
+                pk = pks[table]
+                if pk is None:
+                    log.info("Scanning table %s in a single query (no single numeric primary key)", table)
+                    pending.append((table, cols, ex.submit(_scan_chunk, pool, database, table, cols, charset)))
+                    _collect(max_pending)
+                    continue
+                log.info("Scanning table %s in chunks of %d rows by primary key %s", table, chunk_size, pk)
+                after = None
+                while True:
+                    end = _next_boundary(pool, database, table, pk, after, chunk_size)
+                    # end is None for the last (partial) chunk, which scans everything after the previous boundary
+                    pending.append((table, cols, ex.submit(_scan_chunk, pool, database, table, cols, charset, pk, after, end)))
+                    _collect(max_pending)
+                    if end is None:
+                        break
+                    after = end
+            _collect(0)
+    finally:
+        pool.close()
+
+    for stats in results.values():
+        classify(stats, charset, on_lossy=on_lossy, on_overflow=on_overflow)
+    return results
@@ -22,7 +22,7 @@ Copyright::
 
 """
 from dotenv import load_dotenv
-from os import getenv as env
+from os import getenv as env, path
 from privex.helpers import env_int, env_bool
 
 load_dotenv()
@@ -42,3 +42,12 @@ DB_PORT = env_int('DB_PORT', 3306)
 
 DB_NAME = env('DB_NAME')
 
+# Remote-optimised mode for high latency servers - enables protocol compression, pipelines metadata queries into
+# a single multi-statement round trip, and skips the no-op BEGIN / COMMIT around DDL.
+REMOTE = env_bool('REMOTE', False)
+
+
+# Before each ALTER, the original table / column definitions are saved into a local journal, so that
+# a run (or part of one) can be undone with the 'revert' sub-command. Set JOURNAL=false to disable.
+JOURNAL = env_bool('JOURNAL', True)
+JOURNAL_DIR = env('JOURNAL_DIR', path.expanduser('~/.colfixer/journal'))
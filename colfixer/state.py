@@ -0,0 +1,224 @@
+"""
+Declarative desired state - describe the charset / collation every schema, table and column SHOULD have in a
+YAML / TOML / JSON file, and converge the server to it with the smallest set of ALTERs (at most one per table).
+
+Example state file::
+
+    schemas: [my_app]
+    defaults:
+      charset: utf8mb4
+      collation: utf8mb4_unicode_ci
+    rules:
+      # Legacy tables stay latin1
+      - table: "legacy_*"
+        collation: latin1_swedish_ci
+      # Tokens are compared byte-for-byte
+      - column: "*_token"
+        collation: ascii_bin
+      # Never touch the audit tables
+      - table: "audit_*"
+        ignore: true
+
+Rules are matched using shell-style wildcards (``*``, ``?``, ``[abc]``), case-insensitively. A rule without a
+``column`` applies to the table AND is the default for its columns, while a rule with a ``column`` only applies to
+matching columns. When several rules match, the LAST one wins.
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import logging
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Optional, Tuple
+
+from MySQLdb.connections import Connection
+from privex.helpers import empty, is_true
+
+from colfixer import core, settings
+from colfixer.helpers import load_config_file
+from colfixer.plan import Plan, PlanStep, SkippedColumn, TablePlan
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Target:
+    charset: str
+    collation: str
+
+    def matches(self, charset: Optional[str], collation: Optional[str]) -> bool:
+        return str(charset).lower() == self.charset.lower() and str(collation).lower() == self.collation.lower()
+
+
+@dataclass
+class Rule:
+    schema: str = '*'
+    table: str = '*'
+    column: Optional[str] = None
+    charset: Optional[str] = None
+    collation: Optional[str] = None
+    ignore: bool = False
+
+    @property
+    def target(self) -> Optional[Target]:
+        return None if self.ignore else Target(self.charset, self.collation)
+
+    def match_table(self, schema: str, table: str) -> bool:
+        return fnmatchcase(schema.lower(), self.schema.lower()) and fnmatchcase(table.lower(), self.table.lower())
+
+    def match_column(self, schema: str, table: str, column: str) -> bool:
+        if not self.match_table(schema, table):
+            return False
+        return self.column is None or fnmatchcase(column.lower(), self.column.lower())
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], defaults: Target = None) -> 'Rule':
+        r = cls(
+            schema=str(data.get('schema', '*')), table=str(data.get('table', '*')), column=data.get('column'),
+            charset=data.get('charset'), collation=data.get('collation'), ignore=is_true(data.get('ignore', False))
+        )
+        if r.ignore:
+            return r
+        if empty(r.collation):
+            if empty(r.charset) or defaults is None or r.charset.lower() != defaults.charset.lower():
+                raise AttributeError(f"State rule {data} must specify a 'collation' (or set 'ignore: true')")
+            r.collation = defaults.collation
+        if empty(r.charset):
+            # MySQL/MariaDB collation names always start with their charset, e.g. utf8mb4_bin -> utf8mb4
+            r.charset = r.collation.split('_')[0]
+        return r
+
+
+@dataclass
+class DesiredState:
+    schemas: List[str]
+    defaults: Target
+    rules: List[Rule] = field(default_factory=list)
+    skip_indexed: bool = True
+
+    def table_target(self, schema: str, table: str) -> Optional[Target]:
+        """The desired table default charset / collation, or ``None`` if the table should be ignored"""
+        target = self.defaults
+        for r in self.rules:
+            if r.column is None and r.match_table(schema, table):
+                target = r.target
+        return target
+
+    def column_target(self, schema: str, table: str, column: str) -> Optional[Target]:
+        """The desired charset / collation of a column, or ``None`` if the column should be ignored"""
+        target = self.defaults
+        for r in self.rules:
+            if r.match_column(schema, table, column):
+                target = r.target
+        return target
+
+
+def load_state(filename: str) -> DesiredState:
+    data = load_config_file(filename)
+    d = data.get('defaults', {})
+    defaults = Target(d.get('charset', 'utf8mb4'), d.get('collation', 'utf8mb4_unicode_ci'))
+    schemas = data.get('schemas', [])
+    schemas = [schemas] if isinstance(schemas, str) else list(schemas)
+    if empty(schemas, itr=True):
+        if empty(settings.DB_NAME):
+            raise AttributeError(f"No 'schemas' in state file '{filename}', and no DB_NAME configured - cannot continue!")
+        schemas = [settings.DB_NAME]
+    return DesiredState(
+        schemas=schemas, defaults=defaults, rules=[Rule.from_dict(r, defaults) for r in data.get('rules', [])],
+        skip_indexed=is_true(d.get('skip_indexed', True))
+    )
+
+
+def snapshot(schemas: List[str], conn: Connection = None) -> Tuple[List[core.TableResult], Dict[Tuple[str, str], List[core.TableColumnResult]]]:
+    """Fetch the tables and columns of every schema up front - the whole diff is computed from this one snapshot"""
+    tables, columns = [], {}
+    for s in schemas:
+        tables += core.get_tables(s, conn=conn)
+        for c in core.get_columns(s, conn=conn):
+            columns.setdefault((c.schema, c.table), []).append(c)
+    return tables, columns
+
+
+def converge_table(state: DesiredState, t: core.TableResult, cols: List[core.TableColumnResult],
+                   conn: Connection = None) -> Optional[TablePlan]:
+    """
+    Compute the single ALTER (if any) needed to bring table ``t`` and its columns in line with ``state``.
+
+    If every character column should end up with the table's charset + collation, a real
+    ``CONVERT TO CHARACTER SET`` is used. Otherwise, the table default and each changed column are combined into
+    one ``ALTER TABLE``, using each column's definition from ``SHOW CREATE TABLE`` so ``NOT NULL``, ``DEFAULT`` etc.
+    are kept as-is.
+    """
+    ttarget = state.table_target(t.schema, t.table)
+    if ttarget is None:
+        return None
+    tp = TablePlan(table=t.table, schema=t.schema)
+    char_cols = [c for c in cols if not (empty(c.character_set) and empty(c.collation))]
+    change_default = not ttarget.matches(t.character_set, t.collation)
+    changed: Dict[str, Target] = {}
+    uniform = True
+    for c in char_cols:
+        target = state.column_target(t.schema, t.table, c.column)
+        if target is None:
+            uniform = False
+            tp.skipped.append(SkippedColumn(c.column, 'ignored by state file'))
+            continue
+        if target != ttarget:
+            uniform = False
+        if target.matches(c.character_set, c.collation):
+            continue
+        if not empty(c.column_key) and state.skip_indexed:
+            uniform = False
+            tp.skipped.append(SkippedColumn(c.column, 'column is an index'))
+            continue
+        changed[c.column] = target
+
+    if not change_default and len(changed) == 0:
+        return tp
+    name = f"`{t.schema}`.`{t.table}`"
+    if uniform and len(changed) > 0:
+        stmt = f"ALTER TABLE {name} CONVERT TO CHARACTER SET {ttarget.charset} COLLATE {ttarget.collation};"
+        tp.steps.append(PlanStep('alter', stmt, columns=[c.column for c in char_cols], table_default=True))
+        return tp
+
+    clauses = []
+    if change_default:
+        clauses.append(f"DEFAULT CHARACTER SET {ttarget.charset} DEFAULT COLLATE {ttarget.collation}")
+    if len(changed) > 0:
+        defs = core.column_definitions(core.get_create_table(t.table, database=t.schema, conn=conn))
+        for col, target in changed.items():
+            clauses.append(f"MODIFY {core.retype_definition(defs[col], target.charset, target.collation)}")
+    stmt = f"ALTER TABLE {name} " + ', '.join(clauses) + ';'
+    tp.steps.append(PlanStep('alter', stmt, columns=list(changed.keys()), table_default=change_default))
+    return tp
+
+
+def converge(state: DesiredState, conn: Connection = None) -> Plan:
+    """Diff ``state`` against the server's catalog, returning a :class:`.Plan` with at most one ALTER per table"""
+    tables, columns = snapshot(state.schemas, conn=conn)
+    plan = Plan(database=None, charset=state.defaults.charset, collation=state.defaults.collation)
+    for t in tables:
+        tp = converge_table(state, t, columns.get((t.schema, t.table), []), conn=conn)
+        if tp is None:
+            log.info("Ignoring table %s.%s - ignored by state file", t.schema, t.table)
+            continue
+        plan.tables.append(tp)
+    return plan
@@ -0,0 +1,343 @@
+"""
+Watch daemon - poll the catalog for new / changed tables which don't match the desired charset / collation, and
+convert them automatically while they're still small.
+
+Each poll is a single cheap query against ``INFORMATION_SCHEMA.TABLES``. A table is only looked at in detail (its
+columns fetched and compared to the policy) when its fingerprint - ``CREATE_TIME`` + table collation - differs from
+the cached one, which happens when it's created or rebuilt by an ALTER.
+
+Tables which already exist when the watcher starts are only reported (as ``existing``) on the first poll, unless
+``convert_existing`` is set. Failed conversions are retried on later polls, backing off exponentially.
+
+A small HTTP server exposes ``/metrics`` (Prometheus text format), ``/actions`` (recent actions as JSON) and
+``/health``.
+
+Each conversion is journaled under its own run ID (logged, and included in ``/actions``), so it can be reverted
+on its own - even if the table is later dropped and re-created under the same name, and converted again.
+
+Copyright::
+
+    +===================================================+
+    |                 © 2020 Privex Inc.                |
+    |               https://www.privex.io               |
+    +===================================================+
+    |                                                   |
+    |        MariaDB/MySQL Charset/Collation Fixer      |
+    |        License: X11/MIT                           |
+    |                                                   |
+    |        Core Developer(s):                         |
+    |                                                   |
+    |          (+)  Chris (@someguy123) [Privex]        |
+    |          (+)  Kale (@kryogenic) [Privex]          |
+    |                                                   |
+    +===================================================+
+
+    Official Repo: https://github.com/Privex/collation-fixer
+
+
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from colfixer import core, settings
+from colfixer.journal import Journal
+from colfixer.plan import run_table
+from colfixer.state import DesiredState, converge_table
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class WatchLimits:
+    max_rows: int = 100000
+    """Tables with more rows than this (estimated, from ``TABLE_ROWS``) are not converted automatically"""
+    max_bytes: int = 64 * 1024 * 1024
+    """Tables larger than this (``DATA_LENGTH + INDEX_LENGTH``) are not converted automatically"""
+    max_threads_running: int = 16
+    """Conversions are deferred to the next poll while the server's ``Threads_running`` is above this"""
+
+
+@dataclass
+class WatchedTable:
+    schema: str
+    table: str
+    create_time: Optional[str]
+    collation: Optional[str]
+    rows: int = 0
+    size: int = 0
+
+    @property
+    def fingerprint(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.create_time, self.collation
+
+
+@dataclass
+class WatchAction:
+    schema: str
+    table: str
+    action: str
+    """One of ``converted``, ``would_convert`` (dry run), ``failed``, ``too_large``, ``deferred`` or ``existing``"""
+    detail: str = ''
+    statements: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    run_id: Optional[str] = None
+    """The journal run ID of a conversion - pass it to ``revert`` to undo it"""
+    time: float = field(default_factory=time.time)
+
+
+METRICS_HELP = {
+    'polls_total': ('counter', 'Number of catalog polls'),
+    'poll_errors_total': ('counter', 'Number of polls which failed'),
+    'tables_watched': ('gauge', 'Number of tables seen in the last poll'),
+    'tables_checked_total': ('counter', 'Number of new/changed tables compared against the policy'),
+    'conversions_total': ('counter', 'Number of tables converted'),
+    'conversion_failures_total': ('counter', 'Number of tables which failed to convert'),
+    'too_large_total': ('counter', 'Number of non-compliant tables too large to convert automatically'),
+    'deferred_total': ('counter', 'Number of conversions deferred due to server load'),
+    'existing_total': ('counter', 'Number of non-compliant tables which already existed when the watcher started'),
+    'last_poll_seconds': ('gauge', 'How long the last poll took'),
+    'last_poll_timestamp': ('gauge', 'Unix time of the last poll'),
+}
+
+
+class Watcher:
+    MAX_BACKOFF = 32
+    """A table which keeps failing to convert is retried at most every ``MAX_BACKOFF`` poll intervals"""
+
+    def __init__(self, desired: DesiredState, limits: WatchLimits = None, interval: float = 30, dry_run=False,
+                 journal=True, history: int = 100, convert_existing=False):
+        """
+        :param bool journal: When ``True``, each conversion is recorded in a new journal run (see :class:`.Journal`)
+        :param bool convert_existing: When ``True``, non-compliant tables which already exist when the watcher starts
+                                      are converted too. Otherwise they're only reported as ``existing``.
+        """
+        self.desired = desired
+        self.limits = WatchLimits() if limits is None else limits
+        self.interval = float(interval)
+        self.dry_run = dry_run
+        self.journal = journal
+        self._stats_conn = None
+        self.actions = deque(maxlen=int(history))
+        self.metrics: Dict[str, float] = {k: 0 for k in METRICS_HELP.keys()}
+        self.convert_existing = convert_existing
+        self._fingerprints: Dict[Tuple[str, str], Tuple[Optional[str], Optional[str]]] = {}
+        self._retries: Dict[Tuple[str, str], Tuple[Tuple[Optional[str], Optional[str]], int, float]] = {}
+        """``(schema, table)`` -> ``(fingerprint, attempts, retry_after)`` for tables which failed to convert"""
+        self._seeded = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _incr(self, key: str, amount: float = 1):
+        with self._lock:
+            self.metrics[key] += amount
+
+    def _act(self, action: WatchAction):
+        log.warning("[watch] %s.%s: %s %s", action.schema, action.table, action.action, action.detail)
+        if action.run_id is not None:
+            log.warning("[watch] %s.%s: journal run %s", action.schema, action.table, action.run_id)
+        with self._lock:
+            self.actions.append(action)
+
+    def _fresh_stats(self):
+        """
+        MySQL 8 caches ``TABLE_ROWS``, ``DATA_LENGTH`` and ``CREATE_TIME`` for ``information_schema_stats_expiry``
+        seconds (a day by default), which would hide rebuilt tables and let grown tables slip under the size limits.
+        Disable the cache for our session - once per connection. MariaDB doesn't cache them (nor have the variable).
+        """
+        conn = core.connect()
+        if conn is self._stats_conn:
+            return
+        try:
+            core.query("SET SESSION information_schema_stats_expiry = 0;", use_tx=False, conn=conn)
+        except Exception as e:
+            log.debug("[watch] Could not set information_schema_stats_expiry (probably MariaDB) - %s - %s", type(e), str(e))
+        self._stats_conn = conn
+
+    def list_tables(self) -> List[WatchedTable]:
+        self._fresh_stats()
+        schemas = self.desired.schemas
+        stmt = "SELECT TABLE_SCHEMA, TABLE_NAME, CREATE_TIME, TABLE_COLLATION, TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH " \
+               "FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE' " \
+               f"AND TABLE_SCHEMA IN ({', '.join(['%s'] * len(schemas))});"
+        return [
+            WatchedTable(r[0], r[1], None if r[2] is None else str(r[2]), r[3], int(r[4] or 0), int(r[5] or 0))
+            for r in core.query(stmt, *schemas, use_tx=False)
+        ]
+
+    def threads_running(self) -> int:
+        res = core.query("SHOW GLOBAL STATUS LIKE 'Threads_running';", one=True, use_tx=False)
+        return 0 if res is None else int(res[1])
+
+    def _failed(self, wt: WatchedTable, detail: str, stmts: List[str] = None, elapsed: float = 0.0, run_id: str = None):
+        """Record a failed conversion, and schedule the next attempt with exponential backoff"""
+        key = (wt.schema, wt.table)
+        prev = self._retries.get(key)
+        attempts = prev[1] + 1 if prev is not None and prev[0] == wt.fingerprint else 1
+        delay = self.interval * min(2 ** (attempts - 1), self.MAX_BACKOFF)
+        self._retries[key] = (wt.fingerprint, attempts, time.time() + delay)
+        self._incr('conversion_failures_total')
+        self._act(WatchAction(
+            wt.schema, wt.table, 'failed', f"{detail} (attempt {attempts}, retrying in {delay:.0f}s)",
+            [] if stmts is None else stmts, elapsed, run_id
+        ))
+
+    def check(self, wt: WatchedTable, existing=False) -> bool:
+        """
+        Compare one new/changed table against the policy, converting it if needed and within limits.
+
+        If ``existing`` is ``True`` (the table already existed when the watcher started), a non-compliant table is only
+        reported, never converted.
+
+        Returns ``False`` if the table should be checked again on a later poll (the conversion was deferred or failed).
+        """
+        self._incr('tables_checked_total')
+        tables = core.get_tables(wt.schema, wt.table)
+        if len(tables) == 0:
+            return True
+        tp = converge_table(self.desired, tables[0], core.get_columns(wt.schema, wt.table))
+        if tp is None or len(tp.steps) == 0:
+            return True
+        stmts = [s.statement for s in tp.steps]
+
+        if existing:
+            self._incr('existing_total')
+            self._act(WatchAction(
+                wt.schema, wt.table, 'existing', "table existed before the watcher started - convert it with "
+                "'converge' / 'convert_tables', or run watch with --convert-existing", stmts
+            ))
+            return True
+
+        if wt.rows > self.limits.max_rows or wt.size > self.limits.max_bytes:
+            self._incr('too_large_total')
+            self._act(WatchAction(
+                wt.schema, wt.table, 'too_large', f"{wt.rows} rows / {wt.size} bytes is over the limit "
+                f"({self.limits.max_rows} rows / {self.limits.max_bytes} bytes) - convert it manually", stmts
+            ))
+            return True
+        if self.dry_run:
+            self._act(WatchAction(wt.schema, wt.table, 'would_convert', 'dry run', stmts))
+            return True
+        running = self.threads_running()
+        if running > self.limits.max_threads_running:
+            self._incr('deferred_total')
+            self._act(WatchAction(
+                wt.schema, wt.table, 'deferred', f"Threads_running is {running} (limit {self.limits.max_threads_running})", stmts
+            ))
+            return False
+
+        # A new journal run per conversion, as a journal only keeps the FIRST snapshot of each table
+        jr = Journal(host=settings.DB_HOST, database=wt.schema) if self.journal else None
+        run_id = None if jr is None else jr.run_id
+        status = run_table(tp, core.connect(), host=settings.DB_HOST, journal=jr)
+        if status.status == 'failed':
+            # The ALTER didn't happen, so CREATE_TIME won't change - the table must be retried explicitly
+            self._failed(wt, status.error, stmts, status.elapsed, run_id)
+            return False
+        self._incr('conversions_total')
+        self._act(WatchAction(wt.schema, wt.table, 'converted', '', stmts, status.elapsed, run_id))
+        return True
+
+    def poll(self):
+        start = time.time()
+        tables = self.list_tables()
+        # On the first poll, every table is "new" - only report the ones which don't match, unless convert_existing
+        existing = not self._seeded and not self.convert_existing
+        seen = set()
+        for wt in tables:
+            key = (wt.schema, wt.table)
+            seen.add(key)
+            if self._fingerprints.get(key) == wt.fingerprint:
+                continue
+            retry = self._retries.get(key)
+            if retry is not None and retry[0] == wt.fingerprint and time.time() < retry[2]:
+                continue
+            try:
+                done = self.check(wt, existing=existing)
+            except Exception as e:
+                log.exception("[watch] Error while checking table %s.%s - %s - %s", wt.schema, wt.table, type(e), str(e))
+                if existing:
+                    self._act(WatchAction(wt.schema, wt.table, 'failed', f"could not check existing table: {str(e)}"))
+                    done = True
+                else:
+                    self._failed(wt, str(e))
+                    done = False
+            if done:
+                # A conversion rebuilds the table (changing CREATE_TIME), so the next poll re-checks it once more,
+                # which confirms it now matches the policy and caches the new fingerprint.
+                self._fingerprints[key] = wt.fingerprint
+                self._retries.pop(key, None)
+        for cache in [self._fingerprints, self._retries]:
+            for key in list(cache.keys()):
+                if key not in seen:
+                    del cache[key]
+        self._seeded = True
+        with self._lock:
+            self.metrics['polls_total'] += 1
+            self.metrics['tables_watched'] = len(tables)
+            self.metrics['last_poll_seconds'] = time.time() - start
+            self.metrics['last_poll_timestamp'] = time.time()
+
+    def run_forever(self):
+        log.info("[watch] Watching schemas %s every %s seconds", ', '.join(self.desired.schemas), self.interval)
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.exception("[watch] Error while polling - %s - %s", type(e), str(e))
+                self._incr('poll_errors_total')
+                try:
+                    core.reconnect()
+                except Exception as e:
+                    log.error("[watch] Could not reconnect to the database - %s - %s", type(e), str(e))
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def render_metrics(self) -> str:
+        with self._lock:
+            metrics = dict(self.metrics)
+        lines = []
+        for key, value in metrics.items():
+            mtype, mhelp = METRICS_HELP[key]
+            lines += [f"# HELP colfixer_watch_{key} {mhelp}", f"# TYPE colfixer_watch_{key} {mtype}", f"colfixer_watch_{key} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def recent_actions(self) -> List[dict]:
+        with self._lock:
+            return [asdict(a) for a in reversed(self.actions)]
+
+
+def serve(watcher: Watcher, host='127.0.0.1', port=9330) -> ThreadingHTTPServer:
+    """Start the metrics / actions HTTP server for ``watcher`` in a background thread, and return the server"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0].rstrip('/')
+            if path == '/metrics':
+                body, ctype = watcher.render_metrics(), 'text/plain; version=0.0.4'
+            elif path == '/actions':
+                body, ctype = json.dumps(watcher.recent_actions(), indent=2), 'application/json'
+            elif path in ['', '/health']:
+                body, ctype = json.dumps({'status': 'ok', 'schemas': watcher.desired.schemas}), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            log.debug("[watch http] " + fmt, *args)
+
+    httpd = ThreadingHTTPServer((host, int(port)), Handler)
+    threading.Thread(target=httpd.serve_forever, name='colfixer-watch-http', daemon=True).start()
+    return httpd
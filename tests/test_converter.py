@@ -0,0 +1,154 @@
+"""
+Tests for the asyncio :class:`colfixer.converter.Converter` - connections and queries are stubbed out, so no
+database is needed.
+"""
+import asyncio
+import threading
+
+import pytest
+
+from colfixer import core
+from colfixer.converter import Converter
+from colfixer.plan import Plan, PlanStep, SkippedColumn, TablePlan
+
+
+class FakeConnection:
+    def ping(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    """Stubs out the database - returns the list of statements "executed". Statements containing FAIL raise."""
+    stmts = []
+
+    def _query(stmt, *params, **kwargs):
+        if 'FAIL' in stmt:
+            raise Exception(f"Error executing {stmt}")
+        stmts.append(stmt)
+        return []
+
+    monkeypatch.setattr(core, '_connect', lambda **kw: FakeConnection())
+    monkeypatch.setattr(core, 'query', _query)
+    return stmts
+
+
+def _plan(*tables: TablePlan) -> Plan:
+    return Plan(database='shop', charset='utf8mb4', collation='utf8mb4_unicode_ci', tables=list(tables))
+
+
+def _users() -> TablePlan:
+    return TablePlan(table='users', steps=[
+        PlanStep('table', 'ALTER TABLE users DEFAULT CHARACTER SET utf8mb4;'),
+        PlanStep('column', 'ALTER TABLE users MODIFY name varchar(64) CHARACTER SET utf8mb4;', column='name'),
+    ], skipped=[SkippedColumn('email', 'column is an index')])
+
+
+def _run(conv: Converter, plan: Plan):
+    async def _main():
+        try:
+            return await conv.run(plan)
+        finally:
+            conv.close()
+    return asyncio.run(_main())
+
+
+def test_event_order(executed):
+    conv, events = Converter(max_workers=1), []
+    conv.on('*', lambda ev: events.append((ev.name, ev.table, getattr(ev, 'column', None))))
+    statuses = _run(conv, _plan(_users(), TablePlan(table='posts')))
+
+    assert [s.status for s in statuses] == ['ok', 'noop']
+    assert len(executed) == 2
+    users = [e for e in events if e[1] == 'users']
+    assert users == [
+        ('column_skipped', 'users', 'email'),
+        ('table_started', 'users', None),
+        ('statement_done', 'users', None),
+        ('statement_done', 'users', 'name'),
+        ('table_finished', 'users', None),
+    ]
+    # Tables with nothing to do still report that they're finished
+    assert [e for e in events if e[1] == 'posts'] == [('table_finished', 'posts', None)]
+
+
+def test_hooks_run_on_loop_thread(executed):
+    conv, threads = Converter(max_workers=2), set()
+
+    @conv.on('statement_done')
+    def _sync(ev):
+        threads.add(threading.get_ident())
+
+    async def _async(ev):
+        threads.add(threading.get_ident())
+
+    conv.on('table_finished', _async)
+    _run(conv, _plan(_users(), TablePlan(table='orders', steps=[PlanStep('table', 'ALTER TABLE orders;')])))
+    assert threads == {threading.get_ident()}
+
+
+def test_hook_errors_are_ignored(executed):
+    conv, seen = Converter(max_workers=1), []
+
+    def _bad_sync(ev):
+        raise ValueError('sync hook error')
+
+    async def _bad_async(ev):
+        raise ValueError('async hook error')
+
+    conv.on('statement_done', _bad_sync)
+    conv.on('table_finished', _bad_async)
+    conv.on('table_finished', lambda ev: seen.append(ev.table))
+    statuses = _run(conv, _plan(_users()))
+    assert [s.status for s in statuses] == ['ok']
+    assert seen == ['users']
+
+
+def test_failed_statement(executed):
+    conv, failed = Converter(max_workers=1), []
+    conv.on('table_failed', lambda ev: failed.append(ev.error))
+    tp = TablePlan(table='users', steps=[PlanStep('table', 'ALTER TABLE users FAIL;'), PlanStep('table', 'ALTER 2;')])
+    statuses = _run(conv, _plan(tp))
+    assert statuses[0].status == 'failed' and statuses[0].done == 0
+    assert failed == ['Error executing ALTER TABLE users FAIL;']
+    assert executed == []
+
+
+def test_unknown_event():
+    with pytest.raises(AttributeError):
+        Converter(max_workers=1).on('no_such_event', print)
+
+
+def test_cancel_then_run_again(executed, monkeypatch):
+    conv, in_query, release = Converter(max_workers=1), threading.Event(), threading.Event()
+    run_query = core.query
+
+    def _slow_query(stmt, *params, **kwargs):
+        # Hold the first statement "on the server" until the test has cancelled the run
+        in_query.set()
+        release.wait(5)
+        return run_query(stmt, *params, **kwargs)
+
+    monkeypatch.setattr(core, 'query', _slow_query)
+
+    async def _main():
+        try:
+            task = asyncio.ensure_future(conv.run(_plan(_users())))
+            await asyncio.get_running_loop().run_in_executor(None, in_query.wait, 5)
+            conv.cancel()
+            release.set()
+            first = await task
+            second = await conv.run(_plan(_users()))
+            return first, second
+        finally:
+            conv.close()
+
+    first, second = asyncio.run(_main())
+    # The statement already running is left to finish, but the next one is never started
+    assert first[0].status == 'cancelled' and first[0].done == 1
+    # ... and the cancellation doesn't carry over to the next run
+    assert second[0].status == 'ok' and second[0].done == 2
+    assert len(executed) == 3
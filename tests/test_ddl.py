@@ -0,0 +1,99 @@
+"""
+Tests for the ``SHOW CREATE TABLE`` parsing in :mod:`colfixer.core`, and the reverse ALTERs built from it by
+:func:`colfixer.journal.revert_stmt` - ``revert`` trusts these to rebuild DDL on production tables.
+
+Run with::
+
+    python -m pytest tests/
+
+"""
+from colfixer.core import _split_definition, column_definitions, retype_definition
+from colfixer.journal import ColumnSnapshot, JournalChange, TableSnapshot, revert_stmt
+
+CREATE = """CREATE TABLE `orders` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `status` enum('new','paid (card)','it''s done','say "hi"') COLLATE latin1_bin NOT NULL DEFAULT 'new',
+  `odd``name` varchar(32) DEFAULT NULL,
+  `note` varchar(255) CHARACTER SET latin1 COLLATE latin1_swedish_ci DEFAULT 'x COLLATE y' COMMENT 'CHARSET utf8, COLLATE z',
+  `first` varchar(50) NOT NULL,
+  `last` varchar(50) NOT NULL,
+  `full` varchar(101) GENERATED ALWAYS AS (concat(`first`,' ',`last`)) VIRTUAL,
+  PRIMARY KEY (`id`),
+  KEY `full` (`full`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1"""
+
+
+def test_column_definitions():
+    defs = column_definitions(CREATE)
+    assert list(defs.keys()) == ['id', 'status', 'odd`name', 'note', 'first', 'last', 'full']
+    assert defs['id'] == '`id` int(11) NOT NULL AUTO_INCREMENT'
+    assert defs['odd`name'] == '`odd``name` varchar(32) DEFAULT NULL'
+    assert defs['full'] == "`full` varchar(101) GENERATED ALWAYS AS (concat(`first`,' ',`last`)) VIRTUAL"
+
+
+def test_split_enum_with_quotes_and_parens():
+    head, attrs = _split_definition(column_definitions(CREATE)['status'])
+    assert head == """`status` enum('new','paid (card)','it''s done','say "hi"')"""
+    assert attrs == " COLLATE latin1_bin NOT NULL DEFAULT 'new'"
+
+
+def test_split_escaped_backtick_name():
+    assert _split_definition('`odd``name` varchar(32) DEFAULT NULL') == ('`odd``name` varchar(32)', ' DEFAULT NULL')
+
+
+def test_retype_enum():
+    assert retype_definition(column_definitions(CREATE)['status'], 'utf8mb4', 'utf8mb4_bin') == \
+        """`status` enum('new','paid (card)','it''s done','say "hi"') CHARACTER SET utf8mb4 COLLATE utf8mb4_bin """ \
+        """NOT NULL DEFAULT 'new'"""
+
+
+def test_retype_keeps_collate_inside_default_and_comment():
+    assert retype_definition(column_definitions(CREATE)['note'], 'utf8mb4', 'utf8mb4_unicode_ci') == \
+        "`note` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT 'x COLLATE y' " \
+        "COMMENT 'CHARSET utf8, COLLATE z'"
+
+
+def test_retype_adds_charset_when_missing():
+    assert retype_definition('`odd``name` varchar(32) DEFAULT NULL', 'utf8mb4', 'utf8mb4_bin') == \
+        '`odd``name` varchar(32) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL'
+
+
+def test_retype_generated_column():
+    assert retype_definition(column_definitions(CREATE)['full'], 'utf8mb4', 'utf8mb4_bin') == \
+        "`full` varchar(101) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin " \
+        "GENERATED ALWAYS AS (concat(`first`,' ',`last`)) VIRTUAL"
+
+
+def _snapshot() -> TableSnapshot:
+    defs = column_definitions(CREATE)
+    return TableSnapshot(
+        run_id='r1', host='db1', database='shop', table='orders', create_table=CREATE,
+        character_set='latin1', collation='latin1_swedish_ci', columns={
+            'status': ColumnSnapshot(defs['status'], 'latin1', 'latin1_bin'),
+            'note': ColumnSnapshot(defs['note'], 'latin1', 'latin1_swedish_ci'),
+            'odd`name': ColumnSnapshot(defs['odd`name'], 'latin1', 'latin1_swedish_ci'),
+        }
+    )
+
+
+def _change(kind, column=None) -> JournalChange:
+    return JournalChange(run_id='r1', host='db1', database='shop', table='orders', kind=kind, statement='', column=column)
+
+
+def test_revert_column_and_table_default():
+    stmt = revert_stmt(_snapshot(), [_change('table'), _change('column', 'status'), _change('column', 'odd`name')])
+    assert stmt == (
+        "ALTER TABLE `shop`.`orders` DEFAULT CHARACTER SET latin1 DEFAULT COLLATE latin1_swedish_ci, "
+        """MODIFY `status` enum('new','paid (card)','it''s done','say "hi"') CHARACTER SET latin1 COLLATE latin1_bin """
+        "NOT NULL DEFAULT 'new', "
+        "MODIFY `odd``name` varchar(32) CHARACTER SET latin1 COLLATE latin1_swedish_ci DEFAULT NULL;"
+    )
+
+
+def test_revert_dedupes_columns_and_skips_unknown():
+    stmt = revert_stmt(_snapshot(), [_change('column', 'note'), _change('column', 'note'), _change('column', 'missing')])
+    assert stmt == (
+        "ALTER TABLE `shop`.`orders` MODIFY `note` varchar(255) CHARACTER SET latin1 COLLATE latin1_swedish_ci "
+        "DEFAULT 'x COLLATE y' COMMENT 'CHARSET utf8, COLLATE z';"
+    )
+    assert revert_stmt(_snapshot(), [_change('column', 'missing')]) is None
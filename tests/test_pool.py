@@ -0,0 +1,89 @@
+"""
+Tests for :class:`colfixer.core.ConnectionPool` - connections are stubbed out, so no database is needed.
+"""
+import threading
+
+import pytest
+
+from colfixer import core
+
+
+class FakeConnection:
+    def __init__(self):
+        self.dead = False
+        self.closed = False
+
+    def ping(self):
+        if self.dead:
+            raise Exception('MySQL server has gone away')
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(core, '_connect', lambda **kw: FakeConnection())
+    p = core.ConnectionPool(1)
+    yield p
+    p.close()
+
+
+def test_reuses_connection(pool):
+    with pool.acquire() as c1:
+        pass
+    with pool.acquire() as c2:
+        assert c2 is c1
+
+
+def test_discards_connection_which_died_mid_statement(pool):
+    with pytest.raises(RuntimeError):
+        with pool.acquire() as c1:
+            c1.dead = True
+            raise RuntimeError('killed')
+    assert c1.closed
+    with pool.acquire() as c2:
+        assert c2 is not c1
+
+
+def test_keeps_live_connection_after_error(pool):
+    with pytest.raises(ValueError):
+        with pool.acquire() as c1:
+            raise ValueError('SQL error')
+    with pool.acquire() as c2:
+        assert c2 is c1
+
+
+def test_pings_stale_idle_connection(pool):
+    pool.PING_AFTER = 0
+    with pool.acquire() as c1:
+        pass
+    c1.dead = True
+    with pool.acquire() as c2:
+        assert c2 is not c1 and c1.closed
+
+
+def test_waiter_wakes_when_connection_discarded(pool):
+    checked_out, got = threading.Event(), []
+
+    def _dies():
+        try:
+            with pool.acquire() as c:
+                checked_out.set()
+                # Give the waiter time to block on the full pool
+                threading.Event().wait(0.2)
+                c.dead = True
+                raise RuntimeError('killed')
+        except RuntimeError:
+            pass
+
+    def _waits():
+        checked_out.wait()
+        with pool.acquire() as c:
+            got.append(c)
+
+    t1, t2 = threading.Thread(target=_dies), threading.Thread(target=_waits)
+    t1.start(), t2.start()
+    t1.join(5), t2.join(5)
+    assert not t2.is_alive(), "waiter is still blocked after the only connection was discarded"
+    assert len(got) == 1 and not got[0].dead
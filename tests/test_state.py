@@ -0,0 +1,139 @@
+"""
+Tests for the desired-state rules in :mod:`colfixer.state`, and the DDL :func:`colfixer.state.converge_table`
+produces from them - ``SHOW CREATE TABLE`` is stubbed out, so no database is needed.
+"""
+import pytest
+
+from colfixer import core
+from colfixer.state import DesiredState, Rule, Target, converge_table
+
+DEFAULTS = Target('utf8mb4', 'utf8mb4_unicode_ci')
+
+CREATE = """CREATE TABLE `users` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(64) NOT NULL DEFAULT '',
+  `api_token` char(40) DEFAULT NULL,
+  `email` varchar(255) NOT NULL,
+  `notes` text,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `email` (`email`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1"""
+
+
+def _table(collation='latin1_swedish_ci') -> core.TableResult:
+    return core.TableResult('shop', 'users', collation, collation.split('_')[0])
+
+
+def _col(name, collation='latin1_swedish_ci', key='', column_type='varchar(64)') -> core.TableColumnResult:
+    charset = None if collation is None else collation.split('_')[0]
+    return core.TableColumnResult(
+        'shop', 'users', name, None, 'NO', column_type.split('(')[0], None, column_type, key, '', collation, charset
+    )
+
+
+def _columns(collation='latin1_swedish_ci'):
+    return [
+        _col('id', None, 'PRI', 'int(11)'), _col('name', collation), _col('api_token', collation, column_type='char(40)'),
+        _col('email', collation, 'UNI', 'varchar(255)'), _col('notes', collation, column_type='text'),
+    ]
+
+
+def _state(*rules, skip_indexed=True) -> DesiredState:
+    return DesiredState(
+        schemas=['shop'], defaults=DEFAULTS, rules=[Rule.from_dict(r, DEFAULTS) for r in rules], skip_indexed=skip_indexed
+    )
+
+
+@pytest.fixture(autouse=True)
+def create_table(monkeypatch):
+    monkeypatch.setattr(core, 'get_create_table', lambda table, database=None, conn=None: CREATE)
+
+
+def test_rule_charset_from_collation():
+    r = Rule.from_dict({'column': '*_token', 'collation': 'ascii_bin'}, DEFAULTS)
+    assert (r.charset, r.collation) == ('ascii', 'ascii_bin')
+    assert Rule.from_dict({'table': 'x', 'collation': 'utf8mb4_bin'}).target == Target('utf8mb4', 'utf8mb4_bin')
+
+
+def test_rule_default_collation_for_default_charset():
+    assert Rule.from_dict({'table': 'x', 'charset': 'UTF8MB4'}, DEFAULTS).collation == 'utf8mb4_unicode_ci'
+
+
+def test_rule_requires_collation():
+    with pytest.raises(AttributeError):
+        Rule.from_dict({'table': 'x', 'charset': 'latin1'}, DEFAULTS)
+    with pytest.raises(AttributeError):
+        Rule.from_dict({'table': 'x'}, DEFAULTS)
+    # ... unless the rule ignores the table
+    assert Rule.from_dict({'table': 'x', 'ignore': True}, DEFAULTS).target is None
+
+
+def test_last_rule_wins():
+    st = _state(
+        {'table': 'legacy_*', 'collation': 'latin1_swedish_ci'},
+        {'table': 'LEGACY_keep', 'collation': 'utf8mb4_bin'},
+        {'column': '*_token', 'collation': 'ascii_bin'},
+        {'table': 'audit_*', 'ignore': True},
+    )
+    assert st.table_target('shop', 'users') == DEFAULTS
+    assert st.table_target('shop', 'legacy_orders') == Target('latin1', 'latin1_swedish_ci')
+    assert st.table_target('shop', 'legacy_keep') == Target('utf8mb4', 'utf8mb4_bin')
+    assert st.table_target('shop', 'audit_log') is None
+    # Table rules are the default for their columns, and column rules only apply to matching columns
+    assert st.column_target('shop', 'legacy_orders', 'name') == Target('latin1', 'latin1_swedish_ci')
+    assert st.column_target('shop', 'legacy_orders', 'api_token') == Target('ascii', 'ascii_bin')
+    # A table rule doesn't affect the table_target when it's only for columns
+    assert st.table_target('shop', 'user_token') == DEFAULTS
+
+
+def test_compliant_table_has_no_steps():
+    tp = converge_table(_state(), _table('utf8mb4_unicode_ci'), _columns('utf8mb4_unicode_ci'))
+    assert tp.steps == [] and tp.skipped == []
+
+
+def test_ignored_table():
+    assert converge_table(_state({'table': 'users', 'ignore': True}), _table(), _columns()) is None
+
+
+def test_uniform_uses_convert_to():
+    tp = converge_table(_state(skip_indexed=False), _table(), _columns())
+    assert len(tp.steps) == 1
+    step = tp.steps[0]
+    assert step.statement == "ALTER TABLE `shop`.`users` CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+    assert step.columns == ['name', 'api_token', 'email', 'notes'] and step.table_default
+
+
+def test_column_rule_uses_combined_modify():
+    tp = converge_table(_state({'column': '*_token', 'collation': 'ascii_bin'}, skip_indexed=False), _table(), _columns())
+    assert len(tp.steps) == 1
+    assert tp.steps[0].statement == (
+        "ALTER TABLE `shop`.`users` DEFAULT CHARACTER SET utf8mb4 DEFAULT COLLATE utf8mb4_unicode_ci, "
+        "MODIFY `name` varchar(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT '', "
+        "MODIFY `api_token` char(40) CHARACTER SET ascii COLLATE ascii_bin DEFAULT NULL, "
+        "MODIFY `email` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, "
+        "MODIFY `notes` text CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+    )
+    assert tp.steps[0].columns == ['name', 'api_token', 'email', 'notes'] and tp.steps[0].table_default
+
+
+def test_ignored_column_is_left_alone():
+    # A CONVERT TO would also convert the ignored column, so each other column is modified instead
+    tp = converge_table(_state({'column': 'notes', 'ignore': True}, skip_indexed=False), _table(), _columns())
+    assert [(s.column, s.reason) for s in tp.skipped] == [('notes', 'ignored by state file')]
+    assert 'CONVERT TO' not in tp.steps[0].statement and '`notes`' not in tp.steps[0].statement
+    assert tp.steps[0].columns == ['name', 'api_token', 'email']
+
+
+def test_indexed_column_is_skipped():
+    tp = converge_table(_state(), _table(), _columns())
+    assert [(s.column, s.reason) for s in tp.skipped] == [('email', 'column is an index')]
+    assert 'CONVERT TO' not in tp.steps[0].statement and '`email`' not in tp.steps[0].statement
+    assert tp.steps[0].columns == ['name', 'api_token', 'notes']
+
+
+def test_only_table_default_changes():
+    tp = converge_table(_state(), _table(), _columns('utf8mb4_unicode_ci'))
+    assert [s.statement for s in tp.steps] == [
+        "ALTER TABLE `shop`.`users` DEFAULT CHARACTER SET utf8mb4 DEFAULT COLLATE utf8mb4_unicode_ci;"
+    ]
+    assert tp.steps[0].columns == [] and tp.steps[0].table_default
@@ -0,0 +1,109 @@
+"""
+Tests for :class:`colfixer.watch.Watcher` - the catalog, server status and conversions are stubbed out, so no
+database is needed.
+"""
+import pytest
+
+from colfixer import core, watch
+from colfixer.plan import TableStatus
+from colfixer.state import DesiredState, Target
+from colfixer.watch import WatchedTable, Watcher
+
+
+def _watched(table, create_time='2026-01-01 00:00:00') -> WatchedTable:
+    return WatchedTable('shop', table, create_time, 'latin1_swedish_ci')
+
+
+class FakeServer:
+    def __init__(self, monkeypatch, tables):
+        self.tables = tables
+        self.fail = set()
+        self.converted = []
+        monkeypatch.setattr(Watcher, 'list_tables', lambda w: list(self.tables))
+        monkeypatch.setattr(Watcher, 'threads_running', lambda w: 0)
+        monkeypatch.setattr(core, 'connect', lambda *a, **kw: None)
+        monkeypatch.setattr(core, 'get_tables', lambda schema, table=None, conn=None: [
+            core.TableResult(schema, table, 'latin1_swedish_ci', 'latin1')
+        ])
+        monkeypatch.setattr(core, 'get_columns', lambda schema, table=None, conn=None: [])
+        monkeypatch.setattr(watch, 'run_table', self.run_table)
+
+    def run_table(self, tp, conn, host=None, journal=None):
+        if tp.table in self.fail:
+            return TableStatus(table=tp.table, host=host, status='failed', total=len(tp.steps), error='Lock wait timeout')
+        self.converted.append(tp.table)
+        return TableStatus(table=tp.table, host=host, status='ok', total=len(tp.steps), done=len(tp.steps))
+
+
+def _watcher(**kwargs) -> Watcher:
+    desired = DesiredState(schemas=['shop'], defaults=Target('utf8mb4', 'utf8mb4_unicode_ci'))
+    return Watcher(desired, interval=30, journal=False, **kwargs)
+
+
+def _actions(w: Watcher):
+    return [(a['table'], a['action']) for a in reversed(w.recent_actions())]
+
+
+def test_existing_tables_only_reported(monkeypatch):
+    server = FakeServer(monkeypatch, [_watched('users')])
+    w = _watcher()
+    w.poll()
+    w.poll()
+    assert server.converted == []
+    assert _actions(w) == [('users', 'existing')]
+
+    # A table created after the first poll is converted
+    server.tables.append(_watched('orders'))
+    w.poll()
+    assert server.converted == ['orders']
+
+
+def test_convert_existing(monkeypatch):
+    server = FakeServer(monkeypatch, [_watched('users')])
+    _watcher(convert_existing=True).poll()
+    assert server.converted == ['users']
+
+
+def test_failed_conversion_is_retried_with_backoff(monkeypatch):
+    server = FakeServer(monkeypatch, [])
+    w = _watcher()
+    w.poll()
+    server.tables.append(_watched('users'))
+    server.fail.add('users')
+    now = [1000.0]
+    monkeypatch.setattr(watch.time, 'time', lambda: now[0])
+
+    w.poll()
+    assert _actions(w)[-1] == ('users', 'failed')
+    assert 'attempt 1, retrying in 30s' in w.recent_actions()[0]['detail']
+    # Not retried until the backoff has passed
+    w.poll()
+    assert len(_actions(w)) == 1
+    now[0] += 31
+    w.poll()
+    assert 'attempt 2, retrying in 60s' in w.recent_actions()[0]['detail']
+
+    server.fail.clear()
+    now[0] += 61
+    w.poll()
+    assert server.converted == ['users']
+    assert ('shop', 'users') not in w._retries
+
+
+def test_check_exception_is_retried(monkeypatch):
+    server = FakeServer(monkeypatch, [])
+    w = _watcher()
+    w.poll()
+    server.tables.append(_watched('users'))
+
+    def _broken(*args, **kwargs):
+        raise Exception('MySQL server has gone away')
+
+    with monkeypatch.context() as m:
+        m.setattr(core, 'get_tables', _broken)
+        w.poll()
+    assert _actions(w) == [('users', 'failed')]
+    assert ('shop', 'users') not in w._fingerprints
+    w._retries[('shop', 'users')] = (w._retries[('shop', 'users')][0], 1, 0)
+    w.poll()
+    assert server.converted == ['users']